@@ -0,0 +1,88 @@
+from collections import namedtuple
+
+# Состояние профиля по данным GetPlayerSummaries. game — название игры (gameextrainfo)
+PlayerState = namedtuple("PlayerState", "personastate gameid game lastlogoff")
+
+# Типы событий
+STARTED = "started"  # Начал играть
+SWITCHED = "switched"  # Сменил игру
+STOPPED = "stopped"  # Перестал играть, но остался в сети
+WENT_OFFLINE = "offline"  # Вышел из сети (previous_game — игра, если играл)
+
+ActivityEvent = namedtuple("ActivityEvent", "kind steam_id game previous_game")
+
+# personastate = 0 — не в сети
+OFFLINE = 0
+
+
+def state_from_summary(player):
+    """ Компактное состояние из ответа GetPlayerSummaries """
+    return PlayerState(
+        player.get("personastate"),
+        player.get("gameid"),
+        player.get("gameextrainfo"),
+        player.get("lastlogoff"),
+    )
+
+
+def diff_states(steam_id, old, new):
+    """ События перехода из old в new (old может быть None) """
+    old_game = old.game if old else None
+    old_gameid = old.gameid if old else None
+    events = []
+    if new.game and (new.game != old_game or new.gameid != old_gameid):
+        kind = SWITCHED if old_game else STARTED
+        events.append(ActivityEvent(kind, steam_id, new.game, old_game))
+    went_offline = (
+        new.personastate == OFFLINE
+        and old is not None
+        and old.personastate not in (None, OFFLINE)
+    )
+    if old_game and not new.game:
+        if went_offline:
+            return [ActivityEvent(WENT_OFFLINE, steam_id, None, old_game)]
+        events.append(ActivityEvent(STOPPED, steam_id, None, old_game))
+    elif went_offline:
+        events.append(ActivityEvent(WENT_OFFLINE, steam_id, None, None))
+    return events
+
+
+def changes_game(event):
+    """ Меняет ли событие последнюю игру (то, что хранится в tracking.last_game) """
+    return event.kind != WENT_OFFLINE or event.previous_game is not None
+
+
+class StateStore:
+    """ Последнее известное состояние каждого отслеживаемого профиля """
+
+    def __init__(self):
+        self._states = {}
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, steam_id):
+        return self._states.get(steam_id)
+
+    def game(self, steam_id):
+        state = self._states.get(steam_id)
+        return state.game if state else None
+
+    def restore(self, steam_id, last_game):
+        """ Восстановить последнюю игру из базы данных после перезапуска """
+        self._states[steam_id] = PlayerState(None, None, last_game, None)
+
+    def forget(self, steam_id):
+        self._states.pop(steam_id, None)
+
+    def update(self, steam_id, player):
+        """ Запомнить новое состояние и вернуть список событий (пустой — ничего не изменилось) """
+        new = state_from_summary(player)
+        old = self._states.get(steam_id)
+        if new == old:
+            return []
+        self._states[steam_id] = new
+        if old is not None and old.personastate is None:
+            # Состояние восстановлено из базы: известна только игра, gameid сравнивать не с чем
+            old = old._replace(gameid=new.gameid if new.game == old.game else None)
+        return diff_states(steam_id, old, new)
@@ -0,0 +1,173 @@
+""" Компоненты процесса бота и их запуск.
+
+Импорт ничего не открывает: Application() только создаёт объекты, а база,
+сессия Steam, сервер метрик и фоновые задачи поднимаются в start().
+Независимые шаги запуска идут параллельно, прогрев кэша профилей — в фоне,
+чтобы после перезапуска бот отвечал и опрашивал Steam в пределах STARTUP_BUDGET.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.bot.api import TELEGRAM_PRODUCTION, TelegramAPIServer
+
+import database as db
+import metrics
+import settings
+from app_metadata import AppMetadataCache
+from cache import TTLCache
+from notifier import Notifier
+from outbox import OutboxRelay
+from profiles import ProfileCache
+from steam_api import SteamClient
+from tracker import ActivityTracker
+
+logger = logging.getLogger("app")
+
+
+class Application:
+    """ Бот, клиент Steam, база, кэши, очередь уведомлений и трекер одного процесса """
+
+    def __init__(self, api_token, steam_api_key):
+        server = TelegramAPIServer.from_base(settings.TELEGRAM_API_URL) if settings.TELEGRAM_API_URL else TELEGRAM_PRODUCTION
+        self.bot = Bot(token=api_token, server=server)
+
+        # Общий HTTP-клиент Steam: сессия открывается при запуске и закрывается при остановке
+        self.steam = SteamClient.from_settings(steam_api_key)
+
+        # Одно соединение с базой на весь процесс; таблицы и миграции — при открытии
+        self.storage = db.Database(settings.DB_PATH)
+
+        # Профили пользователей в памяти: команда и нажатие кнопки не ходят в базу
+        self.profile_cache = ProfileCache(
+            self.storage, ttl=settings.PROFILE_CACHE_TTL, max_entries=settings.PROFILE_CACHE_SIZE)
+
+        # Кэш итогов по библиотекам: повторные нажатия /steam и /info не ходят в Steam API
+        self.games_cache = TTLCache(
+            ttl=settings.GAMES_CACHE_TTL,
+            max_entries=settings.GAMES_CACHE_MAX_ENTRIES,
+            max_bytes=settings.GAMES_CACHE_MAX_BYTES,
+            sizeof=lambda data: len(json.dumps(data, ensure_ascii=False)),
+        )
+
+        # Названия игр общие для всех пользователей: GetOwnedGames запрашивается без include_appinfo
+        self.app_metadata = AppMetadataCache(
+            self.storage,
+            self.steam.get_app_info,
+            max_entries=settings.APP_METADATA_CACHE_SIZE,
+            refresh_after=settings.APP_METADATA_REFRESH,
+        )
+
+        # Уведомления отслеживания идут через очередь с учётом лимитов Telegram
+        self.notifier = Notifier(
+            self.bot.send_message,
+            global_rate=settings.TELEGRAM_GLOBAL_RATE,
+            chat_rate=settings.TELEGRAM_CHAT_RATE,
+            workers=settings.NOTIFIER_WORKERS,
+        )
+
+        self.tracker = ActivityTracker(
+            self.steam.poll_statuses,
+            self.notifier.notify,
+            persist=self.save_last_games,
+            interval=settings.POLL_INTERVAL,
+            max_interval=settings.POLL_MAX_INTERVAL,
+            requests_per_minute=settings.STEAM_POLL_REQUESTS_PER_MINUTE,
+            degraded=self.steam.is_degraded,
+            degraded_factor=settings.POLL_DEGRADED_FACTOR,
+        )
+
+        # Если отслеживание вынесено в процессы worker.py, уведомления приходят через outbox
+        self.outbox_relay = OutboxRelay(self.storage, self.notifier, poll_interval=settings.OUTBOX_POLL_INTERVAL)
+
+        self.metrics_server = None
+        self._warm_up_task = None
+
+        # Метрики, которые вычисляются при чтении /metrics
+        metrics.watch_cache("games", self.games_cache)
+        metrics.watch_cache("app_metadata", self.app_metadata)
+        metrics.watch_cache("profiles", self.profile_cache)
+        metrics.watch_tracker(self.tracker)
+        metrics.NOTIFIER_QUEUE.set_function(lambda: len(self.notifier))
+
+    async def load_steam_games(self, steam_id):
+        summary = await self.steam.get_owned_games_summary(steam_id)
+        if not summary or not summary.top_games:
+            return summary
+        names = await self.app_metadata.names(steam_id, [game.appid for game in summary.top_games])
+        top_games = [game._replace(name=names.get(game.appid)) for game in summary.top_games]
+        return summary._replace(top_games=top_games)
+
+    async def fetch_steam_games(self, steam_id):
+        """ Данные об играх пользователя (OwnedGamesSummary или None) """
+        return await self.games_cache.get_or_fetch(steam_id, lambda: self.load_steam_games(steam_id))
+
+    async def save_last_games(self, changes, seen=(), resumed=()):
+        """ Сохранить смены игр пачки одной транзакцией, чтобы после перезапуска не слать повторных уведомлений.
+        Заодно закрываются и открываются игровые сессии для /today и /week """
+        await self.storage.run(db.save_activity, changes, None, seen, resumed)
+
+    async def restore_tracking(self):
+        """ Восстановить активные отслеживания из базы данных """
+        rows = await self.storage.run(db.get_active_tracking)
+        for user_id, steam_id, profile_name, last_game in rows:
+            self.tracker.restore(steam_id, user_id, profile_name, last_game)
+        return len(rows)
+
+    async def warm_up(self):
+        try:
+            users = await self.profile_cache.warm_up(settings.PROFILE_CACHE_SIZE)
+            logger.info("Кэш профилей прогрет: %d пользователей", users)
+        except Exception:
+            logger.exception("Не удалось прогреть кэш профилей")
+
+    async def _start_metrics(self):
+        self.metrics_server = await metrics.start_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    async def start(self, webhook_url=None):
+        """ Открыть ресурсы и запустить фоновые задачи. Возвращает длительность запуска (секунды) """
+        started = time.perf_counter()
+        # Независимые шаги параллельно: база (с миграциями) в своём потоке, сессия Steam,
+        # сервер метрик и установка webhook
+        steps = [self.storage.open(), self.steam.start()]
+        if settings.METRICS_PORT:
+            steps.append(self._start_metrics())
+        if webhook_url:
+            # Повторная установка того же адреса безопасна, поэтому её выполняет каждая реплика
+            steps.append(self.bot.set_webhook(webhook_url, secret_token=settings.WEBHOOK_SECRET))
+        await asyncio.gather(*steps)
+
+        self.notifier.start()
+        if settings.TRACKER_ENABLED:
+            restored = await self.restore_tracking()
+            self.tracker.start()
+        else:
+            restored = 0
+            self.outbox_relay.start()
+        # Кэш профилей прогревается в фоне: обработчики работают и с холодным кэшем
+        self._warm_up_task = asyncio.create_task(self.warm_up())
+
+        elapsed = time.perf_counter() - started
+        metrics.STARTUP_SECONDS.set(elapsed)
+        if elapsed > settings.STARTUP_BUDGET:
+            logger.warning("Запуск занял %.2f с (ожидается до %s с), отслеживаний: %d",
+                           elapsed, settings.STARTUP_BUDGET, restored)
+        else:
+            logger.info("Запуск занял %.2f с, отслеживаний: %d", elapsed, restored)
+        return elapsed
+
+    async def stop(self):
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            await asyncio.gather(self._warm_up_task, return_exceptions=True)
+            self._warm_up_task = None
+        await self.tracker.stop()
+        await self.outbox_relay.stop()
+        await self.notifier.stop()
+        await self.steam.close()
+        await self.storage.close()
+        if self.metrics_server is not None:
+            await self.metrics_server.cleanup()
+            self.metrics_server = None
@@ -0,0 +1,77 @@
+import logging
+import time
+
+import database as db
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Сколько игр держать в памяти
+MAX_ENTRIES = 10000
+
+# Через сколько секунд сведения об игре запрашиваются заново (название и иконка меняются редко)
+REFRESH_AFTER = 30 * 24 * 3600
+
+
+class AppMetadataCache:
+    """ Названия и иконки игр по appid, общие для всех пользователей.
+
+    Цепочка поиска: LRU в памяти -> таблица app_metadata -> Steam.
+    В Steam уходит только то, чего нет в базе или что устарело,
+    одним запросом на библиотеку. Если Steam не ответил, используются
+    устаревшие сведения.
+    """
+
+    def __init__(self, storage, fetch, max_entries=MAX_ENTRIES, refresh_after=REFRESH_AFTER):
+        # fetch(steam_id, appids) -> {appid: (name, icon)} или None
+        self.storage = storage
+        self.fetch = fetch
+        self.refresh_after = refresh_after
+        self._memory = TTLCache(ttl=refresh_after, max_entries=max_entries)
+
+    async def get(self, steam_id, appids):
+        """ {appid: (name, icon)} для appids; steam_id — владелец игр для запроса в Steam """
+        found = {}
+        missing = []
+        for appid in appids:
+            entry = self._memory.get(appid)
+            if entry is None:
+                missing.append(appid)
+            else:
+                found[appid] = entry
+        if not missing:
+            return found
+
+        stale = {}
+        fresh_since = time.time() - self.refresh_after
+        rows = await self.storage.run(db.get_app_metadata, missing)
+        for appid, (name, icon, updated_at) in rows.items():
+            if updated_at >= fresh_since:
+                found[appid] = (name, icon)
+                self._memory.set(appid, (name, icon))
+            else:
+                stale[appid] = (name, icon)
+        missing = [appid for appid in missing if appid not in found]
+        if not missing:
+            return found
+
+        fetched = await self.fetch(steam_id, missing)
+        if fetched:
+            await self.storage.run(db.save_app_metadata, [
+                (appid, name, icon) for appid, (name, icon) in fetched.items()
+            ])
+            for appid, entry in fetched.items():
+                self._memory.set(appid, entry)
+            found.update(fetched)
+        else:
+            logger.warning("Не удалось получить сведения о %d играх", len(missing))
+        for appid, entry in stale.items():
+            found.setdefault(appid, entry)
+        return found
+
+    async def names(self, steam_id, appids):
+        """ {appid: название} для appids """
+        return {appid: name for appid, (name, _) in (await self.get(steam_id, appids)).items()}
+
+    def stats(self):
+        return self._memory.stats()
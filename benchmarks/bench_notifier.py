@@ -0,0 +1,108 @@
+""" Пропускная способность очереди уведомлений против локальной заглушки Bot API.
+
+Сравнивает прямые вызовы bot.send_message (как раньше в трекере) с Notifier:
+сколько уведомлений доставлено, сколько получено ответов 429 и за какое время.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_notifier.py --chats 300 --notifications 1500
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.bot.api import TelegramAPIServer  # noqa: E402
+
+from benchmarks.fake_telegram import FakeBotAPI  # noqa: E402
+from notifier import Notifier  # noqa: E402
+
+TOKEN = "123456:bench-token"
+
+
+def workload(chats, notifications, seed):
+    rnd = random.Random(seed)
+    chat_ids = [100000 + i for i in range(chats)]
+    return [(rnd.choice(chat_ids), f"#{i} 🎮 Пользователь profile начал играть в Game.") for i in range(notifications)]
+
+
+async def run_direct(bot, items):
+    """ Все уведомления сразу, как делал трекер без очереди; ошибки теряют сообщение """
+    async def send(chat_id, text):
+        try:
+            await bot.send_message(chat_id, text)
+        except Exception:
+            pass
+    await asyncio.gather(*(send(chat_id, text) for chat_id, text in items))
+
+
+async def run_queue(bot, items, args):
+    notifier = Notifier(bot.send_message, global_rate=args.global_rate, chat_rate=args.chat_rate,
+                        workers=args.workers)
+    notifier.start()
+    for chat_id, text in items:
+        notifier.enqueue(chat_id, text)
+    await notifier.drain()
+    await notifier.stop()
+    return notifier
+
+
+async def scenario(name, args, items):
+    api = FakeBotAPI(latency=args.latency, global_rate=args.global_rate, chat_rate=args.chat_rate)
+    base_url = await api.start()
+    bot = Bot(TOKEN, server=TelegramAPIServer.from_base(base_url))
+    enqueued_at = time.monotonic()
+    started = time.perf_counter()
+    if name == "direct":
+        await run_direct(bot, items)
+    else:
+        await run_queue(bot, items, args)
+    elapsed = time.perf_counter() - started
+    await (await bot.get_session()).close()
+    await api.stop()
+
+    delivered = sum(len(text.split("\n")) for _, _, text in api.messages)
+    latencies = [when - enqueued_at for when, _, text in api.messages for _ in text.split("\n")]
+    return {
+        "name": name,
+        "elapsed": elapsed,
+        "messages": len(api.messages),
+        "delivered": delivered,
+        "lost": len(items) - delivered,
+        "rejected": api.rejected,
+        "msg_per_s": len(api.messages) / elapsed if elapsed else 0,
+        "p50": statistics.median(latencies) if latencies else 0,
+        "p95": statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--notifications", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа Bot API, с")
+    parser.add_argument("--global-rate", type=int, default=30)
+    parser.add_argument("--chat-rate", type=float, default=1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    items = workload(args.chats, args.notifications, args.seed)
+    print(f"{args.notifications} уведомлений в {args.chats} чатов, задержка API {args.latency * 1000:.0f} мс\n")
+    print(f"{'режим':<8}{'время, с':>10}{'сообщений':>11}{'доставлено':>12}{'потеряно':>10}"
+          f"{'429':>7}{'сообщ/с':>9}{'p50, с':>8}{'p95, с':>8}")
+    for name in ("direct", "queue"):
+        r = await scenario(name, args, items)
+        print(f"{r['name']:<8}{r['elapsed']:>10.2f}{r['messages']:>11}{r['delivered']:>12}{r['lost']:>10}"
+              f"{r['rejected']:>7}{r['msg_per_s']:>9.1f}{r['p50']:>8.2f}{r['p95']:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+""" Замер горячих запросов к tracking/profiles до и после миграций схемы.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_tracking_indexes.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+
+
+def fill(conn, rows, users, active_ratio, seed):
+    """ Заполнить базу: rows записей tracking, из них active_ratio активных """
+    rnd = random.Random(seed)
+    steam_ids = [str(76561197960265728 + i) for i in range(users * 3)]
+    with conn:
+        conn.executemany(
+            "INSERT INTO users(user_id) VALUES(?)",
+            ((user_id,) for user_id in range(users)),
+        )
+        conn.executemany(
+            "INSERT INTO profiles(user_id, profile_name, steam_id) VALUES(?,?,?)",
+            ((i // 3, f"profile{i % 3}", steam_id) for i, steam_id in enumerate(steam_ids)),
+        )
+        active = set()
+
+        def tracking_rows():
+            for _ in range(rows):
+                user_id = rnd.randrange(users)
+                steam_id = steam_ids[user_id * 3 + rnd.randrange(3)]
+                is_active = rnd.random() < active_ratio and (user_id, steam_id) not in active
+                if is_active:
+                    active.add((user_id, steam_id))
+                yield user_id, steam_id, "profile", int(is_active)
+
+        conn.executemany(
+            "INSERT INTO tracking(user_id, steam_id, profile_name, is_active) VALUES(?,?,?,?)",
+            tracking_rows(),
+        )
+    return sorted(active)
+
+
+def timeit(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run_queries(conn, active, users, repeat, seed):
+    """ Среднее время (мс) каждого запроса """
+    rnd = random.Random(seed)
+
+    def lookup_active():
+        user_id, steam_id = rnd.choice(active)
+        conn.execute(
+            "SELECT 1 FROM tracking WHERE user_id=? AND steam_id=? AND is_active=1",
+            (user_id, steam_id),
+        ).fetchone()
+
+    def update_status():
+        # UPDATE tracking из save_activity
+        # Транзакция откатывается, чтобы не менять данные между замерами
+        conn.execute(
+            "UPDATE tracking SET last_check=CURRENT_TIMESTAMP, last_game=? WHERE steam_id=? AND is_active=1",
+            ("Dota 2", rnd.choice(active)[1]),
+        )
+        conn.rollback()
+
+    def stop():
+        user_id, steam_id = rnd.choice(active)
+        conn.execute(
+            "UPDATE tracking SET is_active=0 WHERE user_id=? AND steam_id=? AND is_active=1",
+            (user_id, steam_id),
+        )
+        conn.rollback()
+
+    return {
+        "start/stop lookup": timeit(lookup_active, repeat),
+        "stop_tracking": timeit(stop, repeat),
+        "save_activity": timeit(update_status, repeat),
+        "get_user_profiles": timeit(lambda: db.get_user_profiles(conn, rnd.randrange(users)), repeat),
+        "get_active_tracking": timeit(lambda: db.get_active_tracking(conn), max(1, repeat // 50)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--active-ratio", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        db.create_tables(conn)
+
+        started = time.perf_counter()
+        active = fill(conn, args.rows, args.users, args.active_ratio, args.seed)
+        print(f"Заполнено {args.rows} записей tracking ({len(active)} активных) "
+              f"за {time.perf_counter() - started:.1f} с")
+
+        before = run_queries(conn, active, args.users, args.repeat, args.seed)
+
+        started = time.perf_counter()
+        version = db.migrate(conn)
+        conn.execute("ANALYZE")
+        print(f"Миграции до версии {version} применены за {time.perf_counter() - started:.1f} с\n")
+
+        after = run_queries(conn, active, args.users, args.repeat, args.seed)
+
+        print(f"{'запрос':<26}{'до, мс':>12}{'после, мс':>12}{'ускорение':>12}")
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float("inf")
+            print(f"{name:<26}{before[name]:>12.3f}{after[name]:>12.3f}{speedup:>11.0f}x")
+
+        print("\nПланы запросов после миграций:")
+        for sql in (
+            "SELECT 1 FROM tracking WHERE user_id=1 AND steam_id='1' AND is_active=1",
+            "SELECT user_id, steam_id, profile_name, last_game FROM tracking WHERE is_active=1 ORDER BY steam_id",
+            "SELECT profile_name, steam_id FROM profiles WHERE user_id=1",
+        ):
+            plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+            print(f"  {sql}\n    -> {'; '.join(row[-1] for row in plan)}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
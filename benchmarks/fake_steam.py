@@ -0,0 +1,132 @@
+""" Локальная заглушка Steam Web API для бенчмарков.
+
+GetPlayerSummaries отдаёт синтетических игроков, состояние которых меняется
+со временем: в среднем churn доля игроков в минуту начинает играть, меняет
+игру или выходит из игры. Время каждой смены запоминается, чтобы измерять
+задержку уведомлений. Задержка ответа и доля ошибок (HTTP 500) настраиваются.
+"""
+import asyncio
+import random
+import time
+
+from aiohttp import web
+
+GAMES = [f"Game {i}" for i in range(1, 51)]
+
+
+class FakePlayer:
+    __slots__ = ("steam_id", "game", "next_change", "changes")
+
+    def __init__(self, steam_id, game, next_change):
+        self.steam_id = steam_id
+        self.game = game
+        self.next_change = next_change
+        self.changes = []  # (время смены, новая игра или None)
+
+
+class FakeSteamAPI:
+    def __init__(self, latency=0.05, error_rate=0.0, churn=0.1, library_size=200, seed=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        # Доля игроков, меняющих состояние за минуту
+        self.churn = churn
+        self.library_size = library_size
+        self.calls = {}
+        self.errors = 0
+        self.players = {}
+        self._random = random.Random(seed)
+        self._runner = None
+        self.base_url = None
+
+    def add_players(self, steam_ids):
+        now = time.monotonic()
+        for steam_id in steam_ids:
+            game = self._random.choice(GAMES) if self._random.random() < 0.3 else None
+            self.players[steam_id] = FakePlayer(steam_id, game, now + self._next_delay())
+
+    def _next_delay(self):
+        if not self.churn:
+            return float("inf")
+        return self._random.expovariate(self.churn / 60)
+
+    def _advance(self, player, now):
+        """ Применить все смены состояния, которые должны были произойти к now """
+        while player.next_change <= now:
+            if player.game is None:
+                player.game = self._random.choice(GAMES)
+            elif self._random.random() < 0.5:
+                player.game = None
+            else:
+                player.game = self._random.choice([game for game in GAMES if game != player.game])
+            player.changes.append((player.next_change, player.game))
+            player.next_change += self._next_delay()
+
+    def change_count(self):
+        return sum(len(player.changes) for player in self.players.values())
+
+    async def _delay(self):
+        if self.latency:
+            # Разброс ±50%, как у настоящего API
+            await asyncio.sleep(self.latency * self._random.uniform(0.5, 1.5))
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _failed(self):
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    async def _player_summaries(self, request):
+        self._count("GetPlayerSummaries")
+        await self._delay()
+        if self._failed():
+            return web.Response(status=500)
+        now = time.monotonic()
+        players = []
+        for steam_id in request.query.get("steamids", "").split(","):
+            player = self.players.get(steam_id)
+            if player is None:
+                continue
+            self._advance(player, now)
+            summary = {"steamid": steam_id, "personaname": f"p{steam_id}", "personastate": 1}
+            if player.game:
+                summary["gameextrainfo"] = player.game
+                summary["gameid"] = str(GAMES.index(player.game) + 1)
+            players.append(summary)
+        return web.json_response({"response": {"players": players}})
+
+    async def _owned_games(self, request):
+        self._count("GetOwnedGames")
+        await self._delay()
+        if self._failed():
+            return web.Response(status=500)
+        appinfo = request.query.get("include_appinfo") == "true"
+        wanted = {int(value) for key, value in request.query.items() if key.startswith("appids_filter")}
+        games = []
+        for appid in range(1, self.library_size + 1):
+            if wanted and appid not in wanted:
+                continue
+            game = {"appid": appid, "playtime_forever": appid * 37 % 10000}
+            if appinfo:
+                game.update(name=f"Game {appid}", img_icon_url="0" * 40)
+            games.append(game)
+        return web.json_response({"response": {"game_count": len(games), "games": games}})
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application()
+        app.router.add_get("/ISteamUser/GetPlayerSummaries/v2/", self._player_summaries)
+        app.router.add_get("/IPlayerService/GetOwnedGames/v0001/", self._owned_games)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,78 @@
+""" Локальная заглушка Telegram Bot API для бенчмарков.
+
+Отвечает на sendMessage с заданной задержкой и, как настоящий Telegram,
+возвращает 429 с retry_after при превышении общего лимита и лимита на чат.
+"""
+import asyncio
+import time
+from collections import deque
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    def __init__(self, latency=0.02, global_rate=30, chat_rate=1):
+        self.latency = latency
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.messages = []  # (время, chat_id, текст)
+        self.rejected = 0
+        self.calls = {}
+        self._window = deque()
+        self._last_by_chat = {}
+        self._runner = None
+        self.base_url = None
+
+    def _limited(self, chat_id, now):
+        while self._window and now - self._window[0] >= 1:
+            self._window.popleft()
+        if len(self._window) >= self.global_rate:
+            return True
+        last = self._last_by_chat.get(chat_id)
+        return last is not None and now - last < 1 / self.chat_rate
+
+    async def _handle(self, request):
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        data = await request.post()
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot",
+            }})
+        if method != "sendMessage":
+            return web.json_response({"ok": True, "result": True})
+
+        chat_id = int(data["chat_id"])
+        now = time.monotonic()
+        if self._limited(chat_id, now):
+            self.rejected += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+        self._window.append(now)
+        self._last_by_chat[chat_id] = now
+        self.messages.append((now, chat_id, data["text"]))
+        return web.json_response({"ok": True, "result": {
+            "message_id": len(self.messages), "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"}, "text": data["text"],
+        }})
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
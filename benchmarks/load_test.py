@@ -0,0 +1,309 @@
+""" Нагрузочный тест опроса активности без сети.
+
+Поднимает заглушки Steam API (fake_steam) и Bot API (fake_telegram) в отдельном
+потоке, заводит в свежей базе N пользователей и M отслеживаемых профилей и
+запускает бота через main.create_app() и Application.start(), как в рабочем
+режиме. Пока идёт опрос, синтетические пользователи присылают команды (/list,
+/steam, /info, /today) и нажимают кнопки профилей; обновления проходят через
+диспетчер с настоящими обработчиками. По итогам печатает время запуска, задержку
+уведомлений от смены состояния в Steam до доставки, время обработки команд и
+кнопок, число запросов к Steam и Telegram, память и CPU.
+
+Запуск из корня репозитория:
+    python benchmarks/load_test.py --users 2000 --profiles 5000 --duration 60
+    python benchmarks/load_test.py --json > before.json   # для сравнения между версиями
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, types  # noqa: E402
+
+from benchmarks.fake_steam import FakeSteamAPI  # noqa: E402
+from benchmarks.fake_telegram import FakeBotAPI  # noqa: E402
+import callbacks  # noqa: E402
+import database as db  # noqa: E402
+import main as bot_main  # noqa: E402
+import settings  # noqa: E402
+import steam_api  # noqa: E402
+
+TOKEN = "123456:load-test"
+
+# Имя профиля в уведомлении — "p<steam_id>", по нему находим игрока заглушки
+NOTIFICATION = re.compile(r"Пользователь p(\d+) (?:начал играть в (.+)\.|переключился с .+ на (.+)\.|больше не играет)")
+
+# Действия синтетических пользователей и их доли в нагрузке
+ACTIONS = {
+    "list": 0.25,
+    "steam": 0.15,
+    "info": 0.15,
+    "today": 0.15,
+    "steam_button": 0.2,
+    "track_button": 0.1,
+}
+
+
+class Upstreams:
+    """ Заглушки Steam и Telegram в своём потоке и цикле событий, чтобы не делить CPU цикла бота """
+
+    def __init__(self, args):
+        self.steam = FakeSteamAPI(latency=args.steam_latency, error_rate=args.error_rate,
+                                  churn=args.churn, seed=args.seed)
+        self.telegram = FakeBotAPI(latency=args.telegram_latency, global_rate=args.global_rate,
+                                   chat_rate=args.chat_rate)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def start(self):
+        self._thread.start()
+        self._call(self.steam.start())
+        self._call(self.telegram.start())
+
+    def stop(self):
+        self._call(self.steam.stop())
+        self._call(self.telegram.stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def seed_database(path, users, steam_ids):
+    """ Пользователи, профили и отслеживания: подписок max(users, profiles).
+    Возвращает профили пользователей {user_id: [(profile_id, profile_name), ...]} """
+    db.initialize_database(path)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany("INSERT INTO users(user_id) VALUES(?)", [(100000 + i,) for i in range(users)])
+        subscriptions = [
+            (100000 + i % users, f"p{steam_ids[i % len(steam_ids)]}", steam_ids[i % len(steam_ids)])
+            for i in range(max(users, len(steam_ids)))
+        ]
+        conn.executemany("INSERT OR IGNORE INTO profiles(user_id, profile_name, steam_id) VALUES(?,?,?)",
+                         subscriptions)
+        conn.executemany("INSERT OR IGNORE INTO tracking(user_id, profile_name, steam_id) VALUES(?,?,?)",
+                         subscriptions)
+    profiles = {}
+    for user_id, profile_id, profile_name in conn.execute("SELECT user_id, profile_id, profile_name FROM profiles"):
+        profiles.setdefault(user_id, []).append((profile_id, profile_name))
+    conn.close()
+    return profiles
+
+
+def make_update(update_id, user_id, action, profile):
+    """ Обновление Telegram с командой или нажатием кнопки профиля """
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    if action.endswith("_button"):
+        code = callbacks.STEAM if action == "steam_button" else callbacks.TRACK
+        return types.Update.to_object({"update_id": update_id, "callback_query": {
+            "id": str(update_id), "from": user, "chat_instance": str(user_id),
+            "data": callbacks.encode(code, profile[0]),
+        }})
+    text = f"/{action} {profile[1]}" if action in ("info", "today") else f"/{action}"
+    return types.Update.to_object({"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "from": user,
+        "chat": {"id": user_id, "type": "private"}, "text": text,
+    }})
+
+
+async def generate_traffic(dp, profiles, rate, duration, seed):
+    """ Обновления от случайных пользователей потоком Пуассона с интенсивностью rate в секунду.
+    Возвращает {действие: [время обработки]} и {тип исключения: число} ошибок обработчиков """
+    rnd = random.Random(seed)
+    users = list(profiles)
+    actions, weights = list(ACTIONS), list(ACTIONS.values())
+    timings = {action: [] for action in actions}
+    errors = {}
+
+    async def handle(update, action):
+        start = time.perf_counter()
+        try:
+            await dp.process_update(update)
+        except Exception as e:
+            # Обычно RetryAfter: ответ упёрся в лимит чата, который делит с уведомлениями
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        timings[action].append(time.perf_counter() - start)
+
+    tasks = set()
+    deadline = time.monotonic() + duration
+    update_id = 0
+    while rate and time.monotonic() < deadline:
+        await asyncio.sleep(rnd.expovariate(rate))
+        update_id += 1
+        user_id = rnd.choice(users)
+        action = rnd.choices(actions, weights)[0]
+        update = make_update(update_id, user_id, action, rnd.choice(profiles[user_id]))
+        task = asyncio.create_task(handle(update, action))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return timings, errors
+
+
+def notification_latencies(steam, messages):
+    """ Задержка каждого уведомления: от смены состояния в заглушке до доставки """
+    latencies = []
+    initial = 0
+    for delivered_at, _, text in messages:
+        for line in text.split("\n"):
+            match = NOTIFICATION.search(line)
+            if not match:
+                continue
+            player = steam.players.get(match.group(1))
+            game = match.group(2) or match.group(3)
+            # Последняя смена в то же состояние, случившаяся до доставки
+            times = [at for at, new_game in player.changes if new_game == game and at <= delivered_at]
+            if times:
+                latencies.append(delivered_at - times[-1])
+            else:
+                initial += 1  # Игрок уже играл при первом опросе
+    return latencies, initial
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def configure(args, upstreams, db_path):
+    """ Настройки бота для прогона: те же, что задаются в config.py """
+    settings.API_TOKEN = TOKEN
+    settings.STEAM_API_KEY = "load-test"
+    settings.TELEGRAM_API_URL = upstreams.telegram.base_url
+    settings.DB_PATH = db_path
+    settings.TRACKER_ENABLED = True
+    settings.METRICS_PORT = None
+    settings.POLL_INTERVAL = args.interval
+    settings.POLL_MAX_INTERVAL = args.max_interval
+    settings.STEAM_POLL_REQUESTS_PER_MINUTE = args.rpm
+    settings.STEAM_MAX_CONCURRENCY = args.steam_concurrency
+    settings.TELEGRAM_GLOBAL_RATE = args.global_rate
+    settings.TELEGRAM_CHAT_RATE = args.chat_rate
+    steam_api.STEAM_API_URL = upstreams.steam.base_url
+
+
+async def run(args, upstreams):
+    steam_ids = [str(76561197960265728 + i) for i in range(args.profiles)]
+    upstreams.steam.add_players(steam_ids)
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    db_path = os.path.join(workdir, "steam_bot.db")
+    profiles = seed_database(db_path, args.users, steam_ids)
+    configure(args, upstreams, db_path)
+
+    dp = bot_main.create_app()
+    app = bot_main.app
+    # Контекст, который в рабочем режиме выставляет executor
+    Bot.set_current(app.bot)
+
+    cpu_start, loop_cpu_start = time.process_time(), time.thread_time()
+    startup = await app.start()
+    subscriptions = sum(len(chats) for chats in app.tracker.watchers.values())
+    started = time.perf_counter()
+    timings, handler_errors = await generate_traffic(
+        dp, profiles, args.users * args.commands_per_user / 60, args.duration, args.seed)
+    await app.tracker.stop()
+    polled = time.perf_counter() - started
+    drained = await app.notifier.drain(timeout=args.drain_timeout)
+    elapsed = time.perf_counter() - started
+    await app.notifier.stop(drain_timeout=0)
+    cpu, loop_cpu = time.process_time() - cpu_start, time.thread_time() - loop_cpu_start
+    await app.stop()
+    await (await app.bot.get_session()).close()
+
+    telegram = upstreams.telegram
+    latencies, initial = notification_latencies(upstreams.steam, telegram.messages)
+    notifications = sum(1 for _, _, text in telegram.messages for line in text.split("\n")
+                        if NOTIFICATION.search(line))
+    handled = [value for values in timings.values() for value in values]
+    result = {
+        "users": args.users,
+        "profiles": args.profiles,
+        "subscriptions": subscriptions,
+        "startup_s": round(startup, 3),
+        "duration_s": round(polled, 2),
+        "drained": drained,
+        "steam_changes": upstreams.steam.change_count(),
+        "steam_calls": dict(upstreams.steam.calls),
+        "steam_errors": upstreams.steam.errors,
+        "telegram_calls": telegram.calls.get("sendMessage", 0),
+        "telegram_429": telegram.rejected,
+        "notifications": notifications,
+        "notifications_initial": initial,
+        "notifications_per_s": round(notifications / elapsed, 1) if elapsed else 0,
+        "latency_p50_s": round(statistics.median(latencies), 2) if latencies else 0,
+        "latency_p95_s": round(percentile(latencies, 0.95), 2),
+        "latency_max_s": round(max(latencies), 2) if latencies else 0,
+        "updates": len(handled),
+        "update_errors": handler_errors,
+        "handler_p50_ms": round(statistics.median(handled) * 1000, 1) if handled else 0,
+        "handler_p95_ms": round(percentile(handled, 0.95) * 1000, 1),
+    }
+    for action, values in timings.items():
+        result[f"handler_{action}_p95_ms"] = round(percentile(values, 0.95) * 1000, 1)
+    result.update({
+        "cpu_s": round(cpu, 2),
+        "loop_cpu_s": round(loop_cpu, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--profiles", type=int, default=3000)
+    parser.add_argument("--duration", type=float, default=60, help="сколько секунд работает опрос")
+    parser.add_argument("--interval", type=float, default=10, help="интервал опроса активных, с")
+    parser.add_argument("--max-interval", type=float, default=60, help="предел интервала неактивных, с")
+    parser.add_argument("--rpm", type=float, default=600, help="бюджет запросов к Steam в минуту")
+    parser.add_argument("--commands-per-user", type=float, default=0.1,
+                        help="команд и нажатий кнопок от пользователя в минуту (0 — без них)")
+    parser.add_argument("--steam-concurrency", type=int, default=10)
+    parser.add_argument("--steam-latency", type=float, default=0.05, help="задержка Steam API, с")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="доля ответов 500 от Steam")
+    parser.add_argument("--churn", type=float, default=0.2, help="доля игроков, меняющих состояние за минуту")
+    parser.add_argument("--telegram-latency", type=float, default=0.02, help="задержка Bot API, с")
+    parser.add_argument("--global-rate", type=int, default=30)
+    parser.add_argument("--chat-rate", type=float, default=1)
+    parser.add_argument("--drain-timeout", type=float, default=60, help="сколько ждать отправки очереди после опроса, с")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="вывести результат одной строкой JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    upstreams = Upstreams(args)
+    upstreams.start()
+    try:
+        result = asyncio.run(run(args, upstreams))
+    finally:
+        upstreams.stop()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+        return
+    width = max(len(key) for key in result)
+    for key, value in result.items():
+        print(f"{key:<{width}}  {value}")
+
+
+if __name__ == "__main__":
+    main()
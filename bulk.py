@@ -0,0 +1,190 @@
+""" Массовый импорт и экспорт профилей.
+
+Формат файла — CSV (разделитель «,», «;» или табуляция), по строке на профиль:
+    имя профиля, Steam ID[, отслеживать: 1/да/yes]
+Строка заголовка и пустые строки пропускаются. Экспорт пишет тот же формат,
+поэтому выгруженный файл можно загрузить обратно.
+
+Команды администратора (работают напрямую с базой):
+    python bulk.py import --user-id 123456 profiles.csv [--track]
+    python bulk.py export [--user-id 123456] [-o profiles.csv]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import sqlite3
+import sys
+
+import database as db
+import settings
+from tracker import STEAM_BATCH_SIZE, chunked
+
+# Значения третьего столбца, включающие отслеживание
+TRUE_VALUES = {"1", "+", "да", "yes", "y", "true", "track"}
+
+HEADER = ["profile_name", "steam_id", "tracking"]
+
+
+def decode_upload(data):
+    """ Текст загруженного файла: UTF-8 (с BOM или без), иначе cp1251 из Excel.
+    Если не подходит ни то ни другое — UnicodeDecodeError """
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1251")
+
+
+def parse_profiles(text, track_all=False):
+    """ Разобрать файл: ([(имя, Steam ID, отслеживать), ...], [(номер строки, ошибка), ...]).
+    Повторы имени в файле пропускаются """
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    rows, errors, seen = [], [], set()
+    for line_no, row in enumerate(csv.reader(io.StringIO(text), dialect), 1):
+        row = [cell.strip() for cell in row]
+        if not any(row):
+            continue
+        if line_no == 1 and row[0].lower() in ("profile_name", "name", "имя"):
+            continue
+        if len(row) < 2 or not row[0]:
+            errors.append((line_no, "нужны имя профиля и Steam ID"))
+            continue
+        name, steam_id = row[0], row[1]
+        if not steam_id.isdigit():
+            errors.append((line_no, f"неверный Steam ID {steam_id}"))
+            continue
+        if name in seen:
+            errors.append((line_no, f"имя {name} уже встречалось в файле"))
+            continue
+        seen.add(name)
+        track = track_all or (len(row) > 2 and row[2].lower() in TRUE_VALUES)
+        rows.append((name, steam_id, track))
+    return rows, errors
+
+
+async def validate_steam_ids(steam, steam_ids):
+    """ Проверить Steam ID пачками по 100 параллельно: (существующие, несуществующие, непроверенные) """
+    unique = list(dict.fromkeys(steam_ids))
+    batches = list(chunked(unique, STEAM_BATCH_SIZE))
+    results = await asyncio.gather(*(steam.get_statuses(batch) for batch in batches))
+    valid, invalid, unchecked = set(), set(), set()
+    for batch, players in zip(batches, results):
+        if players is None:
+            unchecked.update(batch)
+            continue
+        for steam_id in batch:
+            (valid if steam_id in players else invalid).add(steam_id)
+    return valid, invalid, unchecked
+
+
+async def import_profiles(storage, steam, user_id, rows, limit=None):
+    """ Проверить и добавить профили пользователя одной транзакцией.
+
+    Возвращает (добавленные [(имя, Steam ID)], включённые отслеживания
+    [(имя, Steam ID)], ошибки [строки]).
+    """
+    errors = []
+    # Строки с уже зарегистрированными именами в Steam не проверяются (они могут лишь включить
+    # отслеживание), новые обрезаются до свободного места: файл на десятки тысяч строк
+    # не должен расходовать квоту ключа Steam API
+    existing = dict(await storage.run(db.get_user_profiles, user_id))
+    known = [row for row in rows if row[0] in existing]
+    rows = [row for row in rows if row[0] not in existing]
+    if limit is not None:
+        room = max(0, limit - len(existing))
+        if len(rows) > room:
+            errors.append(f"Превышен лимит {limit} профилей, пропущено строк: {len(rows) - room}")
+            rows = rows[:room]
+    if rows:
+        valid, invalid, unchecked = await validate_steam_ids(steam, [steam_id for _, steam_id, _ in rows])
+        if invalid:
+            errors.append("Steam ID не найдены: " + ", ".join(sorted(invalid)))
+        if unchecked:
+            errors.append("Steam API не ответил, не проверены: " + ", ".join(sorted(unchecked)))
+        rows = [row for row in rows if row[1] in valid]
+    added, tracked, skipped = await storage.run(db.import_profiles, user_id, known + rows, limit)
+    if skipped:
+        errors.append("Не добавлены (имя уже занято или превышен лимит): " + ", ".join(skipped))
+    return added, tracked, errors
+
+
+def write_profiles_csv(rows, out, with_user=False):
+    """ Записать строки iter_profiles в CSV по мере чтения из базы """
+    writer = csv.writer(out)
+    writer.writerow((["user_id"] if with_user else []) + HEADER)
+    for user_id, profile_name, steam_id, tracking in rows:
+        writer.writerow(([user_id] if with_user else []) + [profile_name, steam_id, int(tracking)])
+
+
+def export_profiles_csv(conn, user_id):
+    """ Профили пользователя в CSV (для отправки файлом в чат) """
+    out = io.StringIO()
+    write_profiles_csv(db.iter_profiles(conn, user_id), out)
+    return out.getvalue()
+
+
+async def run_import(args):
+    from steam_api import SteamClient
+
+    settings.require("STEAM_API_KEY")
+
+    with open(args.file, "rb") as f:
+        try:
+            text = decode_upload(f.read())
+        except UnicodeDecodeError:
+            sys.exit(f"{args.file}: ожидается текст в UTF-8 или cp1251")
+    rows, errors = parse_profiles(text, track_all=args.track)
+    for line_no, error in errors:
+        print(f"Строка {line_no}: {error}", file=sys.stderr)
+
+    storage = db.Database(args.db)
+    steam = SteamClient.from_settings()
+    try:
+        added, tracked, errors = await import_profiles(storage, steam, args.user_id, rows)
+    finally:
+        await steam.close()
+        await storage.close()
+    for error in errors:
+        print(error, file=sys.stderr)
+    print(f"Добавлено профилей: {len(added)}, включено отслеживаний: {len(tracked)}")
+    if tracked:
+        print("Запущенный бот подхватит отслеживания после перезапуска; процессы worker.py — сами")
+
+
+def run_export(args):
+    conn = sqlite3.connect(args.db)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        write_profiles_csv(db.iter_profiles(conn, args.user_id), out, with_user=args.user_id is None)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Массовый импорт и экспорт профилей")
+    parser.add_argument("--db", default=settings.DB_PATH, help="путь к базе данных")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="добавить профили из CSV")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--user-id", type=int, required=True, help="Telegram ID владельца профилей")
+    import_parser.add_argument("--track", action="store_true", help="включить отслеживание всех профилей")
+
+    export_parser = commands.add_parser("export", help="выгрузить профили в CSV")
+    export_parser.add_argument("--user-id", type=int, help="только профили этого пользователя")
+    export_parser.add_argument("-o", "--output", help="файл (по умолчанию — стандартный вывод)")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        asyncio.run(run_import(args))
+    else:
+        run_export(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+""" Компактная упаковка callback_data инлайн-кнопок.
+
+callback_data = код действия (одна заглавная буква) + profile_id в base64url
+без выравнивания, например "T" + "AQ" для профиля 1. Длина не зависит от имени
+профиля и не превышает 12 байт при лимите Telegram в 64. Имя профиля
+восстанавливается по profile_id через индекс ProfileCache.
+"""
+import base64
+
+# Коды действий
+STEAM = "S"  # Статистика игр (/steam)
+TRACK = "T"  # Начать отслеживание (/track)
+UNTRACK = "U"  # Остановить отслеживание (/untrack)
+TRACK_HINT = "H"  # Подсказка про /track
+
+ACTIONS = {STEAM, TRACK, UNTRACK, TRACK_HINT}
+
+
+def encode(action, profile_id=None):
+    if profile_id is None:
+        return action
+    raw = profile_id.to_bytes((profile_id.bit_length() + 7) // 8 or 1, "big")
+    return action + base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode(data):
+    """ (действие, profile_id или None). ValueError, если данные не наши (например, кнопки старого формата) """
+    if not data or data[0] not in ACTIONS or len(data) > 12:
+        raise ValueError(f"Неизвестный callback_data: {data!r}")
+    token = data[1:]
+    if not token:
+        return data[0], None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except ValueError:
+        raise ValueError(f"Неизвестный callback_data: {data!r}")
+    return data[0], int.from_bytes(raw, "big")
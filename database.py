@@ -1,15 +1,24 @@
+import asyncio
+import logging
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from sqlite3 import Error
 
+import metrics
+
+logger = logging.getLogger(__name__)
+
 def create_connection(db_file):
     """ Создать соединение с SQLite базой данных """
     conn = None
     try:
         conn = sqlite3.connect(db_file)
-        print(f"Connected to SQLite, version {sqlite3.version}")
+        logger.info("Connected to SQLite %s", sqlite3.sqlite_version)
         return conn
     except Error as e:
-        print(e)
+        logger.error("Не удалось открыть базу %s: %s", db_file, e)
     
     return conn
 
@@ -51,25 +60,109 @@ def create_tables(conn):
         c.execute(sql_create_tracking_table)
         conn.commit()
     except Error as e:
-        print(e)
+        logger.error("Не удалось создать таблицы: %s", e)
 
-def initialize_database():
-    """ Инициализировать базу данных """
-    database = "steam_bot.db"
-    
+# Миграции схемы: (версия, список SQL). Текущая версия хранится в PRAGMA user_version
+MIGRATIONS = [
+    (1, [
+        # Оставляем только последнюю активную запись для каждой пары (user_id, steam_id)
+        """ UPDATE tracking SET is_active=0
+            WHERE is_active=1 AND tracking_id NOT IN (
+                SELECT MAX(tracking_id) FROM tracking WHERE is_active=1 GROUP BY user_id, steam_id
+            ) """,
+        # Не более одного активного отслеживания на пару, поиск в start/stop_tracking
+        """ CREATE UNIQUE INDEX IF NOT EXISTS idx_tracking_active_user_steam
+            ON tracking(user_id, steam_id) WHERE is_active=1 """,
+        # Покрывающий индекс для get_active_tracking и save_activity
+        """ CREATE INDEX IF NOT EXISTS idx_tracking_active_steam
+            ON tracking(steam_id, user_id, profile_name, last_game, is_active) WHERE is_active=1 """,
+        # Покрывающий индекс для get_user_profiles
+        """ CREATE INDEX IF NOT EXISTS idx_profiles_user
+            ON profiles(user_id, profile_name, steam_id) """,
+    ]),
+    (2, [
+        # Процессы-трекеры (worker.py) и время их последнего сигнала (unix time)
+        """ CREATE TABLE IF NOT EXISTS tracker_workers (
+                worker_id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            ) """,
+        # Уведомления от трекеров для отправки процессом бота
+        """ CREATE TABLE IF NOT EXISTS outbox (
+                message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            ) """,
+    ]),
+    (3, [
+        # Игровые сессии по событиям трекера; у открытой сессии ended_at IS NULL (unix time)
+        """ CREATE TABLE IF NOT EXISTS play_sessions (
+                session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                steam_id TEXT NOT NULL,
+                game TEXT NOT NULL,
+                started_at INTEGER NOT NULL,
+                ended_at INTEGER
+            ) """,
+        """ CREATE INDEX IF NOT EXISTS idx_play_sessions_steam
+            ON play_sessions(steam_id, started_at) """,
+        # Не более одной открытой сессии на профиль
+        """ CREATE UNIQUE INDEX IF NOT EXISTS idx_play_sessions_open
+            ON play_sessions(steam_id) WHERE ended_at IS NULL """,
+        # Итоги по дням: секунды в игре для профиля, дня (YYYY-MM-DD, местное время) и игры
+        """ CREATE TABLE IF NOT EXISTS playtime_daily (
+                steam_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                game TEXT NOT NULL,
+                seconds INTEGER NOT NULL,
+                PRIMARY KEY (steam_id, day, game)
+            ) WITHOUT ROWID """,
+    ]),
+    (4, [
+        # Названия и иконки игр, общие для всех пользователей (updated_at — unix time)
+        """ CREATE TABLE IF NOT EXISTS app_metadata (
+                appid INTEGER PRIMARY KEY,
+                name TEXT,
+                icon TEXT,
+                updated_at INTEGER NOT NULL
+            ) """,
+    ]),
+    (5, [
+        # Когда игра открытой сессии последний раз была видна при опросе (unix time):
+        # по нему сессия закрывается, если бот был остановлен
+        "ALTER TABLE play_sessions ADD COLUMN last_seen INTEGER",
+    ]),
+]
+
+def get_schema_version(conn):
+    """ Текущая версия схемы базы данных """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, target=None):
+    """ Применить недостающие миграции (каждую в своей транзакции) """
+    version = get_schema_version(conn)
+    for migration_version, statements in MIGRATIONS:
+        if migration_version <= version or (target is not None and migration_version > target):
+            continue
+        with conn:
+            conn.execute("BEGIN")
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version={migration_version}")
+        version = migration_version
+    return version
+
+def initialize_database(path="steam_bot.db"):
+    """ Создать таблицы и применить миграции (Database.open делает это сам при запуске) """
     # Создаем соединение с базой данных
-    conn = create_connection(database)
+    conn = create_connection(path)
     
     if conn is not None:
-        # Создаем таблицы
+        # Создаем таблицы и применяем миграции
         create_tables(conn)
+        migrate(conn)
         conn.close()
     else:
-        print("Error! Cannot create the database connection.")
-
-# Инициализируем базу данных при импорте
-initialize_database()
-
+        logger.error("Error! Cannot create the database connection.")
 
 
 def add_user(conn, user_id, username=None, first_name=None, last_name=None):
@@ -92,6 +185,8 @@ def add_profile(conn, user_id, profile_name, steam_id):
         return cur.lastrowid
     except sqlite3.IntegrityError:
         # Профиль с таким именем уже существует для этого пользователя
+        # Неудачный INSERT оставляет открытой транзакцию с блокировкой записи
+        conn.rollback()
         return None
 
 def get_user_profiles(conn, user_id):
@@ -100,100 +195,305 @@ def get_user_profiles(conn, user_id):
     cur.execute("SELECT profile_name, steam_id FROM profiles WHERE user_id=?", (user_id,))
     return cur.fetchall()
 
+def get_user_profile_ids(conn, user_id):
+    """ Все профили пользователя вместе с profile_id: [(profile_id, profile_name, steam_id), ...] """
+    cur = conn.execute("SELECT profile_id, profile_name, steam_id FROM profiles WHERE user_id=?", (user_id,))
+    return cur.fetchall()
+
+def get_tracking_users_profiles(conn, limit):
+    """ Профили пользователей с активным отслеживанием (не более limit пользователей) для прогрева кэша:
+    [(user_id, profile_id, profile_name, steam_id), ...] """
+    cur = conn.execute(
+        """ SELECT user_id, profile_id, profile_name, steam_id FROM profiles
+            WHERE user_id IN (SELECT DISTINCT user_id FROM tracking WHERE is_active=1 LIMIT ?)
+            ORDER BY user_id """, (limit,))
+    return cur.fetchall()
+
 def delete_profile(conn, user_id, profile_name):
-    """ Удалить профиль пользователя """
-    sql = ''' DELETE FROM profiles WHERE user_id=? AND profile_name=? '''
-    cur = conn.cursor()
-    cur.execute(sql, (user_id, profile_name))
-    conn.commit()
-    return cur.rowcount > 0
+    """ Удалить профиль пользователя вместе с его отслеживанием.
+    Возвращает (Steam ID, отключено ли отслеживание) или None, если профиля не было """
+    with conn:
+        row = conn.execute("SELECT steam_id FROM profiles WHERE user_id=? AND profile_name=?",
+                           (user_id, profile_name)).fetchone()
+        if row is None:
+            return None
+        steam_id = row[0]
+        conn.execute("DELETE FROM profiles WHERE user_id=? AND profile_name=?", (user_id, profile_name))
+        # Отслеживание остаётся, если этот Steam ID записан у пользователя под другим именем
+        if conn.execute("SELECT 1 FROM profiles WHERE user_id=? AND steam_id=? LIMIT 1", (user_id, steam_id)).fetchone():
+            return steam_id, False
+        untracked = conn.execute("UPDATE tracking SET is_active=0 WHERE user_id=? AND steam_id=? AND is_active=1",
+                                 (user_id, steam_id)).rowcount > 0
+        if untracked and not conn.execute(
+                "SELECT 1 FROM tracking WHERE steam_id=? AND is_active=1 LIMIT 1", (steam_id,)).fetchone():
+            _close_play_session(conn, steam_id, int(time.time()))
+    return steam_id, untracked
 
 def start_tracking(conn, user_id, steam_id, profile_name):
     """ Начать отслеживание активности профиля """
-    # Сначала проверяем, не отслеживается ли уже этот профиль
-    cur = conn.cursor()
-    cur.execute("SELECT 1 FROM tracking WHERE user_id=? AND steam_id=? AND is_active=1", 
-                (user_id, steam_id))
-    if cur.fetchone():
-        return False  # Уже отслеживается
-    
     sql = ''' INSERT INTO tracking(user_id, steam_id, profile_name, is_active)
               VALUES(?,?,?,1) '''
-    cur.execute(sql, (user_id, steam_id, profile_name))
-    conn.commit()
-    return True
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, (user_id, steam_id, profile_name))
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        # Профиль уже отслеживается (уникальный индекс idx_tracking_active_user_steam)
+        # Неудачный INSERT оставляет открытой транзакцию с блокировкой записи
+        conn.rollback()
+        return False
 
 def stop_tracking(conn, user_id, steam_id):
     """ Остановить отслеживание активности профиля """
     sql = ''' UPDATE tracking SET is_active=0 WHERE user_id=? AND steam_id=? AND is_active=1 '''
     cur = conn.cursor()
     cur.execute(sql, (user_id, steam_id))
+    stopped = cur.rowcount > 0
+    # Профиль больше никто не отслеживает: открытую сессию закрываем сейчас, а не при следующем /track
+    if stopped and not conn.execute("SELECT 1 FROM tracking WHERE steam_id=? AND is_active=1 LIMIT 1", (steam_id,)).fetchone():
+        _close_play_session(conn, steam_id, int(time.time()))
     conn.commit()
-    return cur.rowcount > 0
+    return stopped
+
+def import_profiles(conn, user_id, rows, limit=None):
+    """ Добавить профили [(profile_name, steam_id, track), ...] одной транзакцией.
+    Занятые имена и профили сверх limit пропускаются. Возвращает (добавленные
+    [(имя, Steam ID)], включённые отслеживания [(имя, Steam ID)], пропущенные имена) """
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO users(user_id) VALUES(?)", (user_id,))
+        existing = dict(conn.execute("SELECT profile_name, steam_id FROM profiles WHERE user_id=?", (user_id,)))
+        room = None if limit is None else max(0, limit - len(existing))
+        added, skipped = [], []
+        for profile_name, steam_id, _ in rows:
+            if profile_name in existing or (room is not None and len(added) >= room):
+                if existing.get(profile_name) != steam_id:
+                    skipped.append(profile_name)
+                continue
+            added.append((profile_name, steam_id))
+        conn.executemany("INSERT INTO profiles(user_id, profile_name, steam_id) VALUES(?,?,?)",
+                         [(user_id, profile_name, steam_id) for profile_name, steam_id in added])
+
+        active = {steam_id for steam_id, in conn.execute(
+            "SELECT steam_id FROM tracking WHERE user_id=? AND is_active=1", (user_id,))}
+        profiles = {**existing, **dict(added)}
+        tracked = []
+        for profile_name, steam_id, track in rows:
+            # Отслеживание — только для профилей, которые теперь есть у пользователя с этим Steam ID
+            if track and profiles.get(profile_name) == steam_id and steam_id not in active:
+                active.add(steam_id)
+                tracked.append((profile_name, steam_id))
+        conn.executemany("INSERT INTO tracking(user_id, steam_id, profile_name, is_active) VALUES(?,?,?,1)",
+                         [(user_id, steam_id, profile_name) for profile_name, steam_id in tracked])
+    return added, tracked, skipped
+
+def iter_profiles(conn, user_id=None, batch_size=500):
+    """ Профили с признаком отслеживания: (user_id, profile_name, steam_id, tracking).
+    Читаются порциями, поэтому экспорт всей базы не держит её в памяти """
+    sql = """ SELECT p.user_id, p.profile_name, p.steam_id,
+                     EXISTS(SELECT 1 FROM tracking t
+                            WHERE t.user_id=p.user_id AND t.steam_id=p.steam_id AND t.is_active=1)
+              FROM profiles p """
+    if user_id is None:
+        cur = conn.execute(sql + "ORDER BY p.user_id, p.profile_name")
+    else:
+        cur = conn.execute(sql + "WHERE p.user_id=? ORDER BY p.profile_name", (user_id,))
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
 
 def get_active_tracking(conn):
-    """ Получить список всех активных отслеживаний """
+    """ Получить список всех активных отслеживаний вместе с последней игрой """
     cur = conn.cursor()
-    cur.execute("SELECT user_id, steam_id, profile_name FROM tracking WHERE is_active=1")
+    cur.execute("SELECT user_id, steam_id, profile_name, last_game FROM tracking WHERE is_active=1 ORDER BY steam_id")
     return cur.fetchall()
 
-def update_tracking_status(conn, steam_id, last_game=None):
-    """ Обновить статус отслеживания (последняя проверка, последняя игра) """
+def split_by_day(start, end):
+    """ Разбить интервал [start, end) в unix time по местным суткам: (день, секунды) """
+    while start < end:
+        day = datetime.fromtimestamp(start).date()
+        midnight = datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+        part_end = min(end, int(midnight))
+        yield day.isoformat(), part_end - start
+        start = part_end
+
+def _close_play_session(conn, steam_id, now, at_last_seen=False):
+    """ Закрыть открытую сессию профиля и добавить её время в дневные итоги.
+    at_last_seen — закрыть моментом, когда игра последний раз была видна (после простоя бота) """
+    row = conn.execute(
+        "SELECT session_id, game, started_at, last_seen FROM play_sessions WHERE steam_id=? AND ended_at IS NULL",
+        (steam_id,)
+    ).fetchone()
+    if row is None:
+        return
+    session_id, game, started_at, last_seen = row
+    if at_last_seen and last_seen is not None:
+        now = min(now, max(started_at, last_seen))
+    conn.execute("UPDATE play_sessions SET ended_at=? WHERE session_id=?", (now, session_id))
+    conn.executemany(
+        """ INSERT INTO playtime_daily(steam_id, day, game, seconds) VALUES(?,?,?,?)
+            ON CONFLICT(steam_id, day, game) DO UPDATE SET seconds=seconds + excluded.seconds """,
+        [(steam_id, day, game, seconds) for day, seconds in split_by_day(started_at, now)],
+    )
+
+def save_activity(conn, changes, now=None, seen=(), resumed=()):
+    """ Сохранить итоги опроса пачки одной транзакцией: последнюю игру в tracking,
+    игровые сессии и дневные итоги. changes — список пар (steam_id, last_game),
+    seen — Steam ID, которые всё ещё в той же игре (обновляется last_seen сессии),
+    resumed — Steam ID из changes, впервые опрошенные после перезапуска: их сессия
+    закрывается по last_seen, чтобы простой бота не засчитывался как время в игре """
+    now = int(time.time() if now is None else now)
     sql = ''' UPDATE tracking SET last_check=CURRENT_TIMESTAMP, last_game=?
               WHERE steam_id=? AND is_active=1 '''
-    cur = conn.cursor()
-    cur.execute(sql, (last_game, steam_id))
-    conn.commit()
+    resumed = set(resumed)
+    with conn:
+        conn.executemany(sql, [(last_game, steam_id) for steam_id, last_game in changes])
+        conn.executemany("UPDATE play_sessions SET last_seen=? WHERE steam_id=? AND ended_at IS NULL",
+                         [(now, steam_id) for steam_id in seen])
+        for steam_id, last_game in changes:
+            _close_play_session(conn, steam_id, now, at_last_seen=steam_id in resumed)
+            if last_game:
+                conn.execute(
+                    "INSERT INTO play_sessions(steam_id, game, started_at, last_seen) VALUES(?,?,?,?)",
+                    (steam_id, last_game, now, now),
+                )
 
+def get_playtime(conn, steam_id, since_day, now=None):
+    """ Время в играх с начала дня since_day (date) по сегодня: [(игра, секунды), ...]
+    по убыванию времени. Читает только дневные итоги и открытую сессию """
+    now = int(time.time() if now is None else now)
+    totals = dict(conn.execute(
+        "SELECT game, SUM(seconds) FROM playtime_daily WHERE steam_id=? AND day>=? GROUP BY game",
+        (steam_id, since_day.isoformat()),
+    ).fetchall())
+    # Текущая сессия ещё не попала в итоги
+    row = conn.execute(
+        "SELECT game, started_at FROM play_sessions WHERE steam_id=? AND ended_at IS NULL", (steam_id,)
+    ).fetchone()
+    if row is not None:
+        game, started_at = row
+        since = int(datetime.combine(since_day, datetime.min.time()).timestamp())
+        totals[game] = totals.get(game, 0) + max(0, now - max(started_at, since))
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
 
-# В начале файла добавьте:
-from datetime import datetime
-import sqlite3
+def get_app_metadata(conn, appids):
+    """ Сведения об играх из базы: {appid: (name, icon, updated_at)} """
+    result = {}
+    # SQLite ограничивает число параметров в запросе, поэтому читаем частями
+    for i in range(0, len(appids), 500):
+        part = appids[i:i + 500]
+        cur = conn.execute(
+            f"SELECT appid, name, icon, updated_at FROM app_metadata WHERE appid IN ({','.join('?' * len(part))})",
+            part,
+        )
+        for appid, name, icon, updated_at in cur:
+            result[appid] = (name, icon, updated_at)
+    return result
 
-# Замените инициализацию словарей на:
-def get_db_connection():
-    return sqlite3.connect("steam_bot.db")
+def save_app_metadata(conn, apps, now=None):
+    """ Сохранить сведения об играх [(appid, name, icon), ...] """
+    now = int(time.time() if now is None else now)
+    sql = ''' INSERT INTO app_metadata(appid, name, icon, updated_at) VALUES(?,?,?,?)
+              ON CONFLICT(appid) DO UPDATE SET name=excluded.name, icon=excluded.icon,
+                                               updated_at=excluded.updated_at '''
+    with conn:
+        conn.executemany(sql, [(appid, name, icon, now) for appid, name, icon in apps])
 
-# Пример изменения обработчика команды /register
-@dp.message_handler(commands=['register'])
-async def register_user(message: types.Message):
-    args = message.get_args()
-    if not args:
-        await message.reply("Пожалуйста, укажите имя профиля и Steam ID через пробел. Пример: /register Иван 76561197960435530")
-        return
+def register_worker(conn, worker_id, heartbeat):
+    """ Отметить процесс-трекер как живой """
+    sql = ''' INSERT INTO tracker_workers(worker_id, heartbeat) VALUES(?,?)
+              ON CONFLICT(worker_id) DO UPDATE SET heartbeat=excluded.heartbeat '''
+    with conn:
+        conn.execute(sql, (worker_id, heartbeat))
 
-    try:
-        profile_name, steam_id = args.split(maxsplit=1)
-        if not steam_id.isdigit():
-            await message.reply("Неверный формат Steam ID. Steam ID должен состоять только из цифр.")
-            return
+def remove_worker(conn, worker_id):
+    """ Удалить процесс-трекер из списка (при остановке) """
+    with conn:
+        conn.execute("DELETE FROM tracker_workers WHERE worker_id=?", (worker_id,))
 
-        user_id = message.from_user.id
-        
-        # Проверка Steam ID через Steam API
-        if not await validate_steam_id(steam_id):
-            await message.reply("Неверный Steam ID. Пожалуйста, проверьте правильность ввода.")
-            return
+def get_live_workers(conn, since):
+    """ Удалить давно молчащие процессы-трекеры и вернуть идентификаторы остальных """
+    with conn:
+        conn.execute("DELETE FROM tracker_workers WHERE heartbeat < ?", (since,))
+    cur = conn.execute("SELECT worker_id FROM tracker_workers ORDER BY worker_id")
+    return [row[0] for row in cur.fetchall()]
+
+def add_outbox_messages(conn, messages):
+    """ Положить уведомления [(chat_id, text), ...] в outbox одной транзакцией """
+    with conn:
+        conn.executemany("INSERT INTO outbox(chat_id, text) VALUES(?,?)", messages)
 
-        conn = get_db_connection()
+def take_outbox_messages(conn, limit=500):
+    """ Забрать из outbox до limit уведомлений: [(chat_id, text), ...].
+    BEGIN IMMEDIATE не даёт двум процессам бота забрать одни и те же записи """
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT message_id, chat_id, text FROM outbox ORDER BY message_id LIMIT ?", (limit,)
+        ).fetchall()
+        if rows:
+            conn.execute("DELETE FROM outbox WHERE message_id <= ?", (rows[-1][0],))
+    return [(chat_id, text) for _, chat_id, text in rows]
+
+
+class Database:
+    """ Одно долгоживущее соединение с базой в режиме WAL.
+
+    Все запросы выполняются в отдельном потоке, чтобы цикл событий
+    не блокировался на диске. Функции этого модуля передаются в run()
+    и получают соединение первым аргументом.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-16000",  # 16 МБ
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+    )
+
+    def __init__(self, path="steam_bot.db"):
+        self.path = path
+        self.conn = None
+        # Один поток: соединение SQLite используется строго из него
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, cached_statements=256)
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        create_tables(conn)
+        migrate(conn)
+        return conn
+
+    async def open(self):
+        if self.conn is None:
+            loop = asyncio.get_running_loop()
+            self.conn = await loop.run_in_executor(self._executor, self._connect)
+
+    async def run(self, func, *args):
+        """ Выполнить func(conn, *args) в потоке базы данных """
+        if self.conn is None:
+            await self.open()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._timed, func, args)
+
+    def _timed(self, func, args):
+        # Время выполнения в потоке базы, без ожидания в очереди
         try:
-            # Добавляем пользователя (если еще не существует)
-            add_user(conn, user_id, message.from_user.username, 
-                    message.from_user.first_name, message.from_user.last_name)
-            
-            # Проверяем количество профилей
-            profiles = get_user_profiles(conn, user_id)
-            if len(profiles) >= MAX_PROFILES_PER_USER:
-                await message.reply(f"Вы можете зарегистрировать не более {MAX_PROFILES_PER_USER} профилей.")
-                return
-            
-            # Добавляем профиль
-            if add_profile(conn, user_id, profile_name, steam_id):
-                await message.reply(f"Профиль успешно создан! Имя: {profile_name}, Steam ID: {steam_id}.")
-            else:
-                await message.reply(f"Профиль с именем {profile_name} уже существует.")
+            with metrics.DB_QUERY_SECONDS.time(helper=func.__name__):
+                return func(self.conn, *args)
         finally:
-            conn.close()
-            
-    except ValueError:
-        await message.reply("Неверный формат команды. Пример: /register Иван 76561197960435530")
+            # Соединение общее для всего процесса: незавершённая транзакция держала бы
+            # блокировку записи от worker.py, других реплик и bulk.py
+            if self.conn.in_transaction:
+                logger.warning("%s оставила открытую транзакцию, откат", func.__name__)
+                self.conn.rollback()
+
+    async def close(self):
+        if self.conn is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self.conn.close)
+            self.conn = None
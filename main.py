@@ -1,26 +1,45 @@
-import asyncio
-import aiohttp
-from aiogram import Bot, Dispatcher, types
+import hmac
+import io
+from datetime import date, timedelta
+from aiohttp import web
+from aiogram import Dispatcher, types
+from aiogram.dispatcher.filters import Command
 from aiogram.utils import executor
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-from config import API_TOKEN, STEAM_API_KEY
+import bulk
+import callbacks
+import database as db
+import logs
+import settings
+from app import Application
 
-bot = Bot(token=API_TOKEN)
-dp = Dispatcher(bot)
-
-# Словарь для хранения профилей пользователей
-user_profiles = {}
+# Компоненты процесса (Application); создаются в create_app(), а не при импорте
+app = None
 
 # Максимальное количество профилей на пользователя
-MAX_PROFILES_PER_USER = 5
+MAX_PROFILES_PER_USER = settings.MAX_PROFILES_PER_USER
+
+async def db_call(func, *args):
+    """ Выполнить функцию из database.py в потоке базы данных """
+    return await app.storage.run(func, *args)
+
+async def get_profiles(user_id):
+    """ Профили пользователя: {имя профиля: Steam ID} """
+    return await app.profile_cache.get(user_id)
+
+async def profiles_keyboard(user_id, action):
+    """ Клавиатура выбора профиля; в callback_data — код действия и profile_id """
+    entry = await app.profile_cache.get_entry(user_id)
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    for profile_name, profile_id in entry.ids.items():
+        keyboard.add(InlineKeyboardButton(profile_name, callback_data=callbacks.encode(action, profile_id)))
+    return keyboard
 
 # обработчик команды /start
-@dp.message_handler(commands=['start'])
 async def process_start_command(message: types.Message):
     await message.reply("Привет! Напиши /help, чтобы узнать о моих функциях!")
 
 # Обработчик команды /register
-@dp.message_handler(commands=['register'])
 async def register_user(message: types.Message):
     args = message.get_args()
     if not args:
@@ -34,10 +53,8 @@ async def register_user(message: types.Message):
             return
 
         user_id = message.from_user.id
-        if user_id not in user_profiles:
-            user_profiles[user_id] = {}
-
-        if len(user_profiles[user_id]) >= MAX_PROFILES_PER_USER:
+        # Лимит проверяем по базе: профили могли добавить через другую реплику
+        if len((await app.profile_cache.reload(user_id)).steam_ids) >= MAX_PROFILES_PER_USER:
             await message.reply(f"Вы можете зарегистрировать не более {MAX_PROFILES_PER_USER} профилей.")
             return
 
@@ -46,40 +63,38 @@ async def register_user(message: types.Message):
             await message.reply("Неверный Steam ID. Пожалуйста, проверьте правильность ввода.")
             return
 
-        user_profiles[user_id][profile_name] = steam_id
-        await message.reply(f"Профиль успешно создан! Имя: {profile_name}, Steam ID: {steam_id}.")
+        # Добавляем пользователя (если еще не существует) и профиль
+        await db_call(db.add_user, user_id, message.from_user.username,
+                          message.from_user.first_name, message.from_user.last_name)
+        if await app.profile_cache.add(user_id, profile_name, steam_id):
+            await message.reply(f"Профиль успешно создан! Имя: {profile_name}, Steam ID: {steam_id}.")
+        else:
+            await message.reply(f"Профиль с именем {profile_name} уже существует.")
     except ValueError:
         await message.reply("Неверный формат команды. Пример: /register Иван 76561197960435530")
 
 # Функция для проверки Steam ID через Steam API
 async def validate_steam_id(steam_id):
-    url = f"https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/?key={STEAM_API_KEY}&steamids={steam_id}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data.get("response", {}).get("players", []) != []
-            return False
+    players = await app.steam.get_player_summaries([steam_id])
+    return bool(players)
 
 # Обработчик команды /list
-@dp.message_handler(commands=['list'])
 async def list_profiles(message: types.Message):
-    user_id = message.from_user.id
-    if user_id not in user_profiles or not user_profiles[user_id]:
+    profiles = await get_profiles(message.from_user.id)
+    if not profiles:
         await message.reply("У вас нет зарегистрированных профилей.")
         return
 
     reply_message = "Ваши зарегистрированные профили:\n"
-    for profile_name, steam_id in user_profiles[user_id].items():
+    for profile_name, steam_id in profiles.items():
         reply_message += f"• {profile_name}: {steam_id}\n"
 
     await message.reply(reply_message)
 
 # Обработчик команды /delete
-@dp.message_handler(commands=['delete'])
 async def delete_profile(message: types.Message):
     user_id = message.from_user.id
-    if user_id not in user_profiles or not user_profiles[user_id]:
+    if not await get_profiles(user_id):
         await message.reply("У вас нет зарегистрированных профилей.")
         return
 
@@ -89,73 +104,106 @@ async def delete_profile(message: types.Message):
         return
 
     profile_name = args.strip()
-    if profile_name not in user_profiles[user_id]:
+    deleted = await app.profile_cache.delete(user_id, profile_name)
+    if deleted is None:
         await message.reply(f"Профиль с именем {profile_name} не найден.")
         return
+    steam_id, untracked = deleted
+    # Иначе отслеживание осталось бы без профиля: его не отключить через /untrack
+    if untracked and settings.TRACKER_ENABLED:
+        app.tracker.unwatch(steam_id, user_id)
 
-    del user_profiles[user_id][profile_name]
     await message.reply(f"Профиль {profile_name} успешно удалён.")
 
-# Функция для получения данных об играх пользователя
-async def fetch_steam_games(steam_id):
-    url = f"http://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/?key={STEAM_API_KEY}&steamid={steam_id}&include_appinfo=true&format=json"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data
-            else:
-                return None
+# Массовый импорт: файл CSV с подписью /import (или /import track — сразу включить отслеживание)
+IMPORT_HELP = (
+    "Отправьте файл CSV с подписью /import, по строке на профиль:\n"
+    "Имя профиля,Steam ID[,1 — отслеживать]\n"
+    "Подпись /import track включает отслеживание всех профилей из файла. "
+    "Выгрузить профили в таком же формате можно командой /export."
+)
+
+# Максимальный размер загружаемого файла
+MAX_IMPORT_FILE_SIZE = 1024 * 1024
+
+async def import_help(message: types.Message):
+    await message.reply(IMPORT_HELP)
+
+async def import_profiles(message: types.Message):
+    if message.document.file_size and message.document.file_size > MAX_IMPORT_FILE_SIZE:
+        await message.reply("Файл слишком большой (не более 1 МБ).")
+        return
+
+    user_id = message.from_user.id
+    track_all = 'track' in (message.caption or '').split()[1:]
+    data = (await message.document.download(destination_file=io.BytesIO())).getvalue()
+    try:
+        text = bulk.decode_upload(data)
+    except UnicodeDecodeError:
+        await message.reply(IMPORT_HELP)
+        return
+    rows, errors = bulk.parse_profiles(text, track_all=track_all)
+    if not rows and not errors:
+        await message.reply(IMPORT_HELP)
+        return
+
+    await db_call(db.add_user, user_id, message.from_user.username,
+                  message.from_user.first_name, message.from_user.last_name)
+    added, tracked, import_errors = await bulk.import_profiles(app.storage, app.steam, user_id, rows, MAX_PROFILES_PER_USER)
+    app.profile_cache.invalidate(user_id)
+    if settings.TRACKER_ENABLED:
+        for profile_name, steam_id in tracked:
+            app.tracker.watch(steam_id, user_id, profile_name)
+
+    reply_message = f"Добавлено профилей: {len(added)}. Включено отслеживаний: {len(tracked)}.\n"
+    for line_no, error in errors[:20]:
+        reply_message += f"• Строка {line_no}: {error}\n"
+    for error in import_errors:
+        reply_message += f"• {error}\n"
+    await message.reply(reply_message[:4096])
+
+# Обработчик команды /export
+async def export_profiles(message: types.Message):
+    if not await get_profiles(message.from_user.id):
+        await message.reply("У вас нет зарегистрированных профилей.")
+        return
+
+    data = await db_call(bulk.export_profiles_csv, message.from_user.id)
+    document = types.InputFile(io.BytesIO(data.encode("utf-8-sig")), filename="profiles.csv")
+    await message.reply_document(document, caption="Ваши профили. Этот файл можно загрузить обратно с подписью /import.")
 
 # Обработчик команды /steam
-@dp.message_handler(commands=['steam'])
 async def fetch_steam_user(message: types.Message):
-    user_id = message.from_user.id
-    if user_id not in user_profiles or not user_profiles[user_id]:
+    profiles = await get_profiles(message.from_user.id)
+    if not profiles:
         await message.reply("Сначала зарегистрируйте хотя бы один Steam ID с помощью команды /register.")
         return
 
-    # Создаем клавиатуру для выбора профиля
-    keyboard = InlineKeyboardMarkup(row_width=1)
-    for profile_name in user_profiles[user_id]:
-        button = InlineKeyboardButton(profile_name, callback_data=f"steam_{profile_name}")
-        keyboard.add(button)
-
+    keyboard = await profiles_keyboard(message.from_user.id, callbacks.STEAM)
     await message.reply("Выберите профиль для получения информации об играх:", reply_markup=keyboard)
 
 # Обработчик выбора профиля для /steam
-@dp.callback_query_handler(lambda c: c.data.startswith('steam_'))
-async def process_steam_profile(callback_query: types.CallbackQuery):
-    profile_name = callback_query.data.split('_')[1]
-    user_id = callback_query.from_user.id
-    steam_id = user_profiles[user_id][profile_name]
-
+async def process_steam_profile(callback_query, profile_name, steam_id):
     # Получаем данные о играх пользователя
-    games_data = await fetch_steam_games(steam_id)
-    if games_data and 'response' in games_data and 'games' in games_data['response'] and 'game_count' in games_data['response']:
-        games = games_data['response']['games']
-        game_count = games_data['response']['game_count']
-        total_playtime = sum(game.get('playtime_forever', 0) for game in games) // 60  # Общее время в часах
-
-        games = sorted(games, key=lambda x: x['playtime_forever'], reverse=True)
-        top_games = games[:5]  # Берём только топ-5 игр
+    summary = await app.fetch_steam_games(steam_id)
+    if summary:
+        total_playtime = summary.total_playtime // 60  # Общее время в часах
 
         reply_message = f'📊 Статистика для профиля {profile_name}:\n'
-        reply_message += f"• Всего игр: {game_count}\n"
+        reply_message += f"• Всего игр: {summary.game_count}\n"
         reply_message += f"• Общее время в играх: {total_playtime} ч.\n"
         reply_message += f"\n🎮 Топ-5 игр по времени:\n"
-        for game in top_games:
-            game_name = game.get('name', 'Неизвестная игра')
-            playtime = game.get('playtime_forever', 0) // 60  # Время в часах
+        for game in summary.top_games:  # Топ-5 собран при разборе ответа
+            game_name = game.name or 'Неизвестная игра'
+            playtime = game.playtime_forever // 60  # Время в часах
             reply_message += f"• {game_name}: {playtime} ч.\n"
 
-        await bot.send_message(callback_query.from_user.id, reply_message)
+        await callback_query.bot.send_message(callback_query.from_user.id, reply_message)
     else:
-        await bot.send_message(callback_query.from_user.id, "Не удалось получить список игр. Возможно, профиль Steam закрыт или у пользователя нет игр.")
+        await callback_query.bot.send_message(callback_query.from_user.id, "Не удалось получить список игр. Возможно, профиль Steam закрыт или у пользователя нет игр.")
 
 # Обработчик команды /help
-@dp.message_handler(commands=['help'])
-async def fetch_steam_user(message: types.Message):
+async def send_help(message: types.Message):
     await message.reply(
         'Доступные команды:\n'
         '/register {Имя профиля} {Steam ID} - Зарегистрировать новый Steam ID.\n'
@@ -165,6 +213,10 @@ async def fetch_steam_user(message: types.Message):
         '/track - Начать отслеживание активности.\n'
         '/untrack - Остановить отслеживание активности.\n'
         '/info - Показать информацию о профиле.\n'
+        '/import - Загрузить профили из файла CSV.\n'
+        '/export - Выгрузить профили в файл CSV.\n'
+        '/today [Имя профиля] - Сколько играли сегодня.\n'
+        '/week [Имя профиля] - Сколько играли за 7 дней.\n'
         'Чтобы найти Steam ID:\n'
         '1. Зайдите в Steam.\n'
         '2. Нажмите "Об аккаунте".\n'
@@ -172,10 +224,9 @@ async def fetch_steam_user(message: types.Message):
     )
 
 # Обработчик команды /info
-@dp.message_handler(commands=['info'])
 async def show_profile_info(message: types.Message):
-    user_id = message.from_user.id
-    if user_id not in user_profiles or not user_profiles[user_id]:
+    profiles = await get_profiles(message.from_user.id)
+    if not profiles:
         await message.reply("У вас нет зарегистрированных профилей.")
         return
 
@@ -185,143 +236,218 @@ async def show_profile_info(message: types.Message):
         return
 
     profile_name = args.strip()
-    if profile_name not in user_profiles[user_id]:
+    steam_id = await app.profile_cache.steam_id(message.from_user.id, profile_name)
+    if steam_id is None:
         await message.reply(f"Профиль с именем {profile_name} не найден.")
         return
 
-    steam_id = user_profiles[user_id][profile_name]
-    games_data = await fetch_steam_games(steam_id)
-    if games_data and 'response' in games_data and 'games' in games_data['response'] and 'game_count' in games_data['response']:
-        games = games_data['response']['games']
-        game_count = games_data['response']['game_count']
-        total_playtime = sum(game.get('playtime_forever', 0) for game in games) // 60  # Общее время в часах
+    summary = await app.fetch_steam_games(steam_id)
+    if summary:
+        total_playtime = summary.total_playtime // 60  # Общее время в часах
 
         reply_message = f'📋 Информация о профиле {profile_name}:\n'
         reply_message += f"• Steam ID: {steam_id}\n"
-        reply_message += f"• Всего игр: {game_count}\n"
+        reply_message += f"• Всего игр: {summary.game_count}\n"
         reply_message += f"• Общее время в играх: {total_playtime} ч.\n"
 
         await message.reply(reply_message)
     else:
         await message.reply("Не удалось получить информацию о профиле.")
 
-# Отслеживание активности
-tracked_users = {}
-
-async def fetch_steam_status(steam_id):
-    url = f"https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/?key={STEAM_API_KEY}&format=json&steamids={steam_id}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                if data and "response" in data and "players" in data["response"]:
-                    return data["response"]["players"][0]
-            return None
-
-async def track_user_activity(steam_id, chat_id, profile_name):
-    last_game = None
-
-    while steam_id in tracked_users:  # Отслеживаем, пока пользователь есть в списке
-        status = await fetch_steam_status(steam_id)
-        if status:
-            game_name = status.get("gameextrainfo")
-            if game_name and game_name != last_game:
-                last_game = game_name
-                await bot.send_message(chat_id, f"🎮 Пользователь {profile_name} начал играть в {game_name}.")
-            elif not game_name and last_game:
-                await bot.send_message(chat_id, f"🛑 Пользователь {profile_name} больше не играет.")
-                last_game = None
-        await asyncio.sleep(30)  # Задержка между проверками (30 секунд)
-
 # Обработчик команды /track
-@dp.message_handler(commands=['track'])
 async def start_tracking(message: types.Message):
-    user_id = message.from_user.id
-    if user_id not in user_profiles or not user_profiles[user_id]:
+    profiles = await get_profiles(message.from_user.id)
+    if not profiles:
         await message.reply("Сначала зарегистрируйте хотя бы один Steam ID с помощью команды /register.")
         return
 
-    # Создаем клавиатуру для выбора профиля
-    keyboard = InlineKeyboardMarkup(row_width=1)
-    for profile_name in user_profiles[user_id]:
-        button = InlineKeyboardButton(profile_name, callback_data=f"track_{profile_name}")
-        keyboard.add(button)
-
+    keyboard = await profiles_keyboard(message.from_user.id, callbacks.TRACK)
     await message.reply("Выберите профиль для отслеживания активности:", reply_markup=keyboard)
 
 # Обработчик выбора профиля для /track
-@dp.callback_query_handler(lambda c: c.data.startswith('track_'))
-async def process_track_profile(callback_query: types.CallbackQuery):
-    profile_name = callback_query.data.split('_')[1]
+async def process_track_profile(callback_query, profile_name, steam_id):
     user_id = callback_query.from_user.id
-    steam_id = user_profiles[user_id][profile_name]
-
-    if steam_id in tracked_users:
-        await bot.send_message(callback_query.from_user.id, f"Отслеживание профиля {profile_name} уже включено.")
+    # Профиль попадает в общий цикл опроса планировщика
+    if not await db_call(db.start_tracking, user_id, steam_id, profile_name):
+        await callback_query.bot.send_message(callback_query.from_user.id, f"Отслеживание профиля {profile_name} уже включено.")
         return
+    if settings.TRACKER_ENABLED:
+        app.tracker.watch(steam_id, user_id, profile_name)
 
-    tracked_users[steam_id] = callback_query.from_user.id
-    await bot.send_message(callback_query.from_user.id, f"Начинаю отслеживать активность профиля {profile_name}.")
-
-    # Запускаем отслеживание активности
-    asyncio.create_task(track_user_activity(steam_id, callback_query.from_user.id, profile_name))
+    await callback_query.bot.send_message(callback_query.from_user.id, f"Начинаю отслеживать активность профиля {profile_name}.")
 
 # Обработчик команды /untrack
-@dp.message_handler(commands=['untrack'])
 async def stop_tracking(message: types.Message):
-    user_id = message.from_user.id
-    if user_id not in user_profiles or not user_profiles[user_id]:
+    profiles = await get_profiles(message.from_user.id)
+    if not profiles:
         await message.reply("Сначала зарегистрируйте хотя бы один Steam ID с помощью команды /register.")
         return
 
-    # Создаем клавиатуру для выбора профиля
-    keyboard = InlineKeyboardMarkup(row_width=1)
-    for profile_name in user_profiles[user_id]:
-        button = InlineKeyboardButton(profile_name, callback_data=f"untrack_{profile_name}")
-        keyboard.add(button)
-
+    keyboard = await profiles_keyboard(message.from_user.id, callbacks.UNTRACK)
     await message.reply("Выберите профиль для остановки отслеживания:", reply_markup=keyboard)
 
 # Обработчик выбора профиля для /untrack
-@dp.callback_query_handler(lambda c: c.data.startswith('untrack_'))
-async def process_untrack_profile(callback_query: types.CallbackQuery):
-    profile_name = callback_query.data.split('_')[1]
+async def process_untrack_profile(callback_query, profile_name, steam_id):
     user_id = callback_query.from_user.id
-    steam_id = user_profiles[user_id][profile_name]
+    if not await db_call(db.stop_tracking, user_id, steam_id):
+        await callback_query.bot.send_message(callback_query.from_user.id, f"Профиль {profile_name} не отслеживается.")
+        return
+    if settings.TRACKER_ENABLED:
+        app.tracker.unwatch(steam_id, user_id)
+
+    await callback_query.bot.send_message(callback_query.from_user.id, f"Отслеживание профиля {profile_name} остановлено.")
 
-    if steam_id not in tracked_users:
-        await bot.send_message(callback_query.from_user.id, f"Профиль {profile_name} не отслеживается.")
+# Отчёты о времени в играх строятся по дневным итогам из базы, без запросов к Steam
+def format_duration(seconds):
+    hours, minutes = divmod(seconds // 60, 60)
+    return f"{hours} ч. {minutes} мин." if hours else f"{minutes} мин."
+
+async def send_playtime_report(message, days, title):
+    profiles = await get_profiles(message.from_user.id)
+    if not profiles:
+        await message.reply("У вас нет зарегистрированных профилей.")
         return
 
-    del tracked_users[steam_id]  # Удаляем пользователя из списка отслеживаемых
-    await bot.send_message(callback_query.from_user.id, f"Отслеживание профиля {profile_name} остановлено.")
+    profile_name = message.get_args().strip()
+    if profile_name:
+        steam_id = await app.profile_cache.steam_id(message.from_user.id, profile_name)
+        if steam_id is None:
+            await message.reply(f"Профиль с именем {profile_name} не найден.")
+            return
+        profiles = {profile_name: steam_id}
+
+    since_day = date.today() - timedelta(days=days - 1)
+    reply_message = f"{title}\n"
+    for profile_name, steam_id in profiles.items():
+        games = await db_call(db.get_playtime, steam_id, since_day)
+        total = sum(seconds for _, seconds in games)
+        reply_message += f"\n• {profile_name}: {format_duration(total)}\n"
+        for game, seconds in games:
+            reply_message += f"  – {game}: {format_duration(seconds)}\n"
+
+    reply_message += "\nВремя учитывается только для отслеживаемых профилей (/track)."
+    await message.reply(reply_message)
+
+# Обработчик команды /today
+async def show_today_playtime(message: types.Message):
+    await send_playtime_report(message, 1, "🕒 Время в играх сегодня:")
+
+# Обработчик команды /week
+async def show_week_playtime(message: types.Message):
+    await send_playtime_report(message, 7, "🕒 Время в играх за последние 7 дней:")
 
-@dp.message_handler()
 async def some_message(msg: types.Message):
     # Создаем инлайн-кнопку
-    steam_button = InlineKeyboardButton("Отслеживать активность Steam", callback_data="track_steam_activity")
+    steam_button = InlineKeyboardButton("Отслеживать активность Steam", callback_data=callbacks.encode(callbacks.TRACK_HINT))
     keyboard = InlineKeyboardMarkup().add(steam_button)
 
     await msg.reply("Нажмите кнопку ниже, чтобы начать отслеживать активность Steam.", reply_markup=keyboard)
 
-@dp.callback_query_handler(lambda c: c.data == 'track_steam_activity')
-async def process_callback_track_steam(callback_query: types.CallbackQuery):
-    await bot.answer_callback_query(callback_query.id)
-    await bot.send_message(callback_query.from_user.id, "Введите команду /track, чтобы начать отслеживать активность.")
+async def process_callback_track_steam(callback_query):
+    await callback_query.bot.send_message(callback_query.from_user.id, "Введите команду /track, чтобы начать отслеживать активность.")
+
+# Действия кнопок выбора профиля: код действия -> обработчик(callback_query, имя профиля, Steam ID)
+PROFILE_CALLBACKS = {
+    callbacks.STEAM: process_steam_profile,
+    callbacks.TRACK: process_track_profile,
+    callbacks.UNTRACK: process_untrack_profile,
+}
+
+# Все нажатия кнопок проходят через один обработчик и разбираются по словарю
+async def route_callback(callback_query: types.CallbackQuery):
+    await callback_query.answer()
+    user_id = callback_query.from_user.id
+    try:
+        action, profile_id = callbacks.decode(callback_query.data)
+    except ValueError:
+        await callback_query.bot.send_message(user_id, "Эта кнопка устарела. Повторите команду.")
+        return
+
+    if action == callbacks.TRACK_HINT:
+        await process_callback_track_steam(callback_query)
+        return
 
+    profile = await app.profile_cache.profile(user_id, profile_id) if profile_id is not None else None
+    if profile is None:
+        await callback_query.bot.send_message(user_id, "Профиль не найден. Возможно, он был удалён.")
+        return
+    await PROFILE_CALLBACKS[action](callback_query, *profile)
+
+
+def register_handlers(dp):
+    """ Зарегистрировать обработчики команд и кнопок (порядок важен: последний — для прочих сообщений) """
+    dp.register_message_handler(process_start_command, commands=['start'])
+    dp.register_message_handler(register_user, commands=['register'])
+    dp.register_message_handler(list_profiles, commands=['list'])
+    dp.register_message_handler(delete_profile, commands=['delete'])
+    dp.register_message_handler(import_help, commands=['import'])
+    dp.register_message_handler(import_profiles, Command('import', ignore_caption=False),
+                                content_types=types.ContentType.DOCUMENT)
+    dp.register_message_handler(export_profiles, commands=['export'])
+    dp.register_message_handler(fetch_steam_user, commands=['steam'])
+    dp.register_message_handler(send_help, commands=['help'])
+    dp.register_message_handler(show_profile_info, commands=['info'])
+    dp.register_message_handler(start_tracking, commands=['track'])
+    dp.register_message_handler(stop_tracking, commands=['untrack'])
+    dp.register_message_handler(show_today_playtime, commands=['today'])
+    dp.register_message_handler(show_week_playtime, commands=['week'])
+    dp.register_message_handler(some_message)
+    dp.register_callback_query_handler(route_callback)
+
+def create_app():
+    """ Проверить настройки, создать компоненты и диспетчер с обработчиками.
+    Ресурсы (база, сессии, фоновые задачи) открываются позже, в on_startup """
+    global app
+    settings.require("API_TOKEN", "STEAM_API_KEY")
+    if settings.BOT_MODE == 'webhook':
+        # Без секрета любой, кто знает адрес, может прислать обновление от имени чужого from.id
+        settings.require("WEBHOOK_URL", "WEBHOOK_SECRET")
+    app = Application(settings.API_TOKEN, settings.STEAM_API_KEY)
+    dp = Dispatcher(app.bot)
+    register_handlers(dp)
+    return dp
+
+async def on_startup(dispatcher):
+    await app.start()
+
+async def on_shutdown(dispatcher):
+    await app.stop()
+
+# Режим webhook
+async def on_startup_webhook(dispatcher):
+    # Webhook устанавливается параллельно с остальными шагами запуска
+    await app.start(webhook_url=settings.WEBHOOK_URL + settings.WEBHOOK_PATH)
+
+async def on_shutdown_webhook(dispatcher):
+    # Webhook не удаляем: обновления продолжают получать остальные реплики
+    await on_shutdown(dispatcher)
+
+def secret_token_middleware(secret):
+    """ Отклонять запросы без верного X-Telegram-Bot-Api-Secret-Token """
+    @web.middleware
+    async def check_secret_token(request, handler):
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(token.encode(), secret.encode()):
+            return web.Response(status=401)
+        return await handler(request)
+    return check_secret_token
+
+def start_webhook(dp):
+    middlewares = [secret_token_middleware(settings.WEBHOOK_SECRET)]
+    webhook = executor.set_webhook(
+        dp,
+        settings.WEBHOOK_PATH,
+        on_startup=on_startup_webhook,
+        on_shutdown=on_shutdown_webhook,
+        web_app=web.Application(middlewares=middlewares),
+    )
+    webhook.run_app(host=settings.WEBAPP_HOST, port=settings.WEBAPP_PORT)
 
 if __name__ == '__main__':
-    executor.start_polling(dp, skip_updates=True)
-
-
-from database import (
-    get_db_connection,
-    add_user,
-    add_profile,
-    get_user_profiles,
-    delete_profile,
-    start_tracking,
-    stop_tracking,
-    get_active_tracking,
-    update_tracking_status
-)
+    logs.setup_logging(settings.LOG_FORMAT, settings.LOG_LEVEL)
+    dp = create_app()
+    if settings.BOT_MODE == 'webhook':
+        start_webhook(dp)
+    else:
+        executor.start_polling(dp, skip_updates=True, on_startup=on_startup, on_shutdown=on_shutdown)
+
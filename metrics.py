@@ -0,0 +1,192 @@
+""" Метрики в текстовом формате Prometheus.
+
+Все метрики бота объявлены в конце модуля и обновляются прямо в горячих
+местах: запросах к Steam, отправке в Telegram, вызовах базы и цикле опроса.
+Отдаются по HTTP на /metrics (start_server), если задан METRICS_PORT.
+"""
+import bisect
+import time
+from contextlib import contextmanager
+
+from aiohttp import web
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name, key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, key, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """ Монотонно растущий счётчик """
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """ Текущее значение. set_function вычисляет его в момент чтения метрик """
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, func, **labels):
+        self._functions[self._key(labels)] = func
+
+    def _samples(self):
+        yield from super()._samples()
+        for key, func in self._functions.items():
+            yield self.name, key, (), func()
+
+
+class Histogram(_Metric):
+    """ Распределение значений по корзинам (обычно длительности в секундах) """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            # Счётчики по корзинам (последняя — +Inf), сумма
+            series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        for key, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket", key, (("le", _format_value(bound)),), cumulative
+            yield self.name + "_sum", key, (), total
+            yield self.name + "_count", key, (), cumulative
+
+
+def render():
+    """ Все метрики в текстовом формате Prometheus """
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+async def handle_metrics(request):
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+
+async def start_server(host, port):
+    """ Запустить HTTP-сервер с /metrics. Вернёт runner для остановки (runner.cleanup()) """
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+# Процесс
+STARTUP_SECONDS = Gauge(
+    "startup_seconds", "Длительность последнего запуска: от on_startup до приёма обновлений и опроса")
+
+# Steam API
+STEAM_REQUEST_SECONDS = Histogram(
+    "steam_request_seconds", "Длительность запросов к Steam API", ["endpoint"])
+STEAM_REQUEST_ERRORS = Counter(
+    "steam_request_errors_total", "Неудачные запросы к Steam API", ["endpoint", "reason"])
+STEAM_CIRCUIT_OPEN = Gauge(
+    "steam_circuit_open", "Разомкнут ли предохранитель метода Steam API (1 — да)", ["endpoint"])
+
+# Telegram
+TELEGRAM_SEND_SECONDS = Histogram(
+    "telegram_send_seconds", "Длительность отправки сообщений в Telegram")
+TELEGRAM_SEND_ERRORS = Counter(
+    "telegram_send_errors_total", "Ошибки отправки сообщений в Telegram", ["error"])
+NOTIFIER_QUEUE = Gauge(
+    "notifier_queue_messages", "Уведомлений в очереди отправки")
+
+# База данных
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Длительность вызовов функций database.py", ["helper"])
+
+# Опрос активности
+POLL_CYCLE_SECONDS = Histogram(
+    "poll_cycle_seconds", "Длительность такта опроса профилей")
+POLL_LAG_SECONDS = Histogram(
+    "poll_lag_seconds", "Насколько опрос отстал от запланированного времени",
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600))
+TRACKED_PROFILES = Gauge(
+    "tracked_profiles", "Отслеживаемых Steam ID в этом процессе")
+TRACKED_SUBSCRIPTIONS = Gauge(
+    "tracked_subscriptions", "Подписок чатов на профили в этом процессе")
+
+# Кэши
+CACHE_HIT_RATIO = Gauge(
+    "cache_hit_ratio", "Доля попаданий в кэш", ["cache"])
+CACHE_ENTRIES = Gauge(
+    "cache_entries", "Записей в кэше", ["cache"])
+
+
+def watch_cache(name, cache):
+    """ Экспортировать статистику кэша (TTLCache или объект со stats()) """
+    CACHE_HIT_RATIO.set_function(lambda: cache.stats()["hit_ratio"], cache=name)
+    CACHE_ENTRIES.set_function(lambda: cache.stats()["entries"], cache=name)
+
+
+def watch_tracker(tracker):
+    TRACKED_PROFILES.set_function(lambda: len(tracker.watchers))
+    TRACKED_SUBSCRIPTIONS.set_function(lambda: sum(len(chats) for chats in tracker.watchers.values()))
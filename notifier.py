@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.utils.exceptions import RetryAfter, TelegramAPIError
+
+import metrics
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram: ~30 сообщений в секунду всего и 1 в секунду на чат
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+
+# Максимальная длина сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+
+class Notifier:
+    """ Очередь исходящих уведомлений с ограничением скорости.
+
+    Общий лимит и лимит на чат реализованы вёдрами токенов. Уведомления,
+    накопившиеся для одного чата, склеиваются в одно сообщение. При
+    RetryAfter отправка приостанавливается на указанное Telegram время.
+    """
+
+    def __init__(self, send, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, workers=4):
+        # send(chat_id, text) — корутина отправки, обычно bot.send_message
+        self.send = send
+        # Без запаса на всплеск: отправки равномерно распределяются по секунде
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.workers = workers
+        self._chat_buckets = {}
+        # chat_id -> список текстов, порядок — очередь чатов на отправку
+        self._pending = OrderedDict()
+        self._ready = asyncio.Queue()
+        self._queued = set()
+        self._delayed = []  # куча (когда можно отправлять, chat_id)
+        self._paused_until = 0
+        self._tasks = []
+        self._wakeup = None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.retries = 0
+
+    def __len__(self):
+        return sum(len(texts) for texts in self._pending.values())
+
+    async def notify(self, chat_id, text):
+        """ Поставить уведомление в очередь (совместимо с bot.send_message) """
+        self.enqueue(chat_id, text)
+
+    def enqueue(self, chat_id, text):
+        texts = self._pending.setdefault(chat_id, [])
+        texts.append(text)
+        if len(texts) == 1:
+            self._schedule(chat_id)
+
+    def _schedule(self, chat_id):
+        if chat_id in self._queued:
+            return
+        self._queued.add(chat_id)
+        wait = self._chat_bucket(chat_id).delay()
+        if wait:
+            heapq.heappush(self._delayed, (time.monotonic() + wait, chat_id))
+            if self._wakeup is not None:
+                self._wakeup.set()
+        else:
+            self._ready.put_nowait(chat_id)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate)
+        return bucket
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks.append(asyncio.create_task(self._release_delayed()))
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def drain(self, timeout=None):
+        """ Дождаться отправки всего накопленного. False, если не успели за timeout """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._pending or self._queued:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def stop(self, drain_timeout=5):
+        """ Остановить очередь, по возможности отправив накопленное """
+        if self._tasks and drain_timeout:
+            await self.drain(drain_timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pending:
+            logger.warning("Не отправлено %d уведомлений при остановке", len(self))
+
+    async def _release_delayed(self):
+        """ Переносит чаты из отложенных в очередь, когда истекает их лимит """
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, chat_id = heapq.heappop(self._delayed)
+                self._ready.put_nowait(chat_id)
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            try:
+                await self._send_pending(chat_id)
+            except Exception:
+                logger.exception("Ошибка очереди уведомлений для чата %s", chat_id)
+            finally:
+                self._queued.discard(chat_id)
+                if chat_id in self._pending:
+                    self._schedule(chat_id)
+                elif len(self._chat_buckets) > 10000:
+                    self._prune_buckets()
+
+    async def _acquire(self, chat_id):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            wait = self._chat_bucket(chat_id).delay(now) or self.global_bucket.take(now)
+            if not wait:
+                self._chat_bucket(chat_id).take(now)
+                return
+            await asyncio.sleep(wait)
+
+    async def _send_pending(self, chat_id):
+        # Сначала ждём лимит: пока ждём, в очередь чата успевают прийти новые уведомления
+        await self._acquire(chat_id)
+        texts = self._pending.pop(chat_id, None)
+        if not texts:
+            return
+        # Склеиваем всё, что помещается в одно сообщение; остаток ждёт следующего токена
+        parts, length = [], 0
+        while texts and (not parts or length + len(texts[0]) + 1 <= MAX_MESSAGE_LENGTH):
+            text = texts.pop(0)
+            parts.append(text)
+            length += len(text) + 1
+        if texts:
+            self._pending[chat_id] = texts
+            self._pending.move_to_end(chat_id, last=False)
+        try:
+            with metrics.TELEGRAM_SEND_SECONDS.time():
+                await self.send(chat_id, "\n".join(parts))
+        except RetryAfter as e:
+            # Telegram просит подождать: возвращаем сообщения в начало очереди чата
+            metrics.TELEGRAM_SEND_ERRORS.inc(error="RetryAfter")
+            self.retries += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + e.timeout)
+            self._pending[chat_id] = parts + self._pending.get(chat_id, [])
+            logger.warning("Flood control Telegram, пауза %s с", e.timeout)
+            return
+        except TelegramAPIError as e:
+            # Бот заблокирован, чат не найден и т.п. — повтор не поможет
+            metrics.TELEGRAM_SEND_ERRORS.inc(error=type(e).__name__)
+            self.dropped += len(parts)
+            logger.warning("Не удалось отправить уведомление в чат %s: %s", chat_id, e)
+            return
+        self.sent += 1
+        self.coalesced += len(parts) - 1
+
+    def _prune_buckets(self):
+        now = time.monotonic()
+        for chat_id in [c for c, b in self._chat_buckets.items() if c not in self._pending and b.is_full(now)]:
+            del self._chat_buckets[chat_id]
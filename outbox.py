@@ -0,0 +1,90 @@
+import asyncio
+import logging
+
+import database as db
+
+logger = logging.getLogger(__name__)
+
+# Как часто накопленные уведомления записываются в outbox / читаются из него (секунды)
+FLUSH_INTERVAL = 0.5
+
+# Сколько уведомлений процесс бота забирает за один запрос
+TAKE_LIMIT = 500
+
+
+class Outbox:
+    """ Сторона процесса-трекера: складывает уведомления в таблицу outbox.
+
+    notify() совместим с Notifier.notify; записи копятся в памяти и
+    сбрасываются одной транзакцией раз в FLUSH_INTERVAL.
+    """
+
+    def __init__(self, storage, flush_interval=FLUSH_INTERVAL):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._task = None
+
+    async def notify(self, chat_id, text):
+        self._buffer.append((chat_id, text))
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        messages, self._buffer = self._buffer, []
+        try:
+            await self.storage.run(db.add_outbox_messages, messages)
+        except Exception:
+            # Вернём в буфер и попробуем на следующем такте
+            self._buffer[:0] = messages
+            logger.exception("Не удалось записать %d уведомлений в outbox", len(messages))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+class OutboxRelay:
+    """ Сторона процесса бота: забирает уведомления из outbox в очередь отправки """
+
+    def __init__(self, storage, notifier, poll_interval=FLUSH_INTERVAL, limit=TAKE_LIMIT):
+        self.storage = storage
+        self.notifier = notifier
+        self.poll_interval = poll_interval
+        self.limit = limit
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                messages = await self.storage.run(db.take_outbox_messages, self.limit)
+            except Exception:
+                logger.exception("Не удалось прочитать outbox")
+                messages = []
+            for chat_id, text in messages:
+                self.notifier.enqueue(chat_id, text)
+            # Полная выборка — возможно, в outbox есть ещё; читаем сразу
+            if len(messages) < self.limit:
+                await asyncio.sleep(self.poll_interval)
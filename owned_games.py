@@ -0,0 +1,119 @@
+import codecs
+import heapq
+import json
+import re
+from collections import namedtuple
+
+# Из каждой игры храним только то, что показываем пользователю
+GameEntry = namedtuple("GameEntry", "appid name playtime_forever")
+
+# Итог по библиотеке: число игр, общее время (минуты) и топ игр по времени
+OwnedGamesSummary = namedtuple("OwnedGamesSummary", "game_count total_playtime top_games")
+
+# Сколько игр показывать в топе
+TOP_GAMES = 5
+
+_GAME_COUNT = re.compile(r'"game_count"\s*:\s*(\d+)')
+_WHITESPACE = re.compile(r"[\s,]*")
+
+
+class OwnedGamesParser:
+    """ Потоковый разбор ответа GetOwnedGames.
+
+    Тело подаётся кусками в feed(); игры разбираются по одной, в памяти
+    остаются только сумма времени и куча из top_n самых долгих игр,
+    так что расход памяти не зависит от размера библиотеки.
+    """
+
+    def __init__(self, top_n=TOP_GAMES):
+        self.top_n = top_n
+        self.parsed = 0
+        self.total_playtime = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._heap = []  # (playtime, -appid, GameEntry) — минимальная куча
+        self._buf = ""
+        self._head = ""  # Текст до массива games и после него: там game_count
+        self._state = "head"
+
+    def feed(self, chunk):
+        self._buf += self._decoder.decode(chunk)
+        self._parse()
+
+    def _parse(self):
+        if self._state == "head":
+            start = self._buf.find('"games"')
+            if start < 0:
+                # Ключ может быть разрезан между кусками: хвост оставляем в буфере
+                keep = max(0, len(self._buf) - len('"games"'))
+                self._head += self._buf[:keep]
+                self._buf = self._buf[keep:]
+                return
+            bracket = self._buf.find("[", start)
+            if bracket < 0:
+                return
+            self._head += self._buf[:start]
+            self._buf = self._buf[bracket + 1:]
+            self._state = "games"
+        if self._state == "games":
+            self._parse_bulk()
+            pos = 0
+            while True:
+                pos = _WHITESPACE.match(self._buf, pos).end()
+                if pos >= len(self._buf):
+                    break
+                if self._buf[pos] == "]":
+                    self._state = "tail"
+                    pos += 1
+                    break
+                try:
+                    game, end = self._json.raw_decode(self._buf, pos)
+                except ValueError:
+                    break  # Объект ещё не пришёл целиком
+                self._add(game)
+                pos = end
+            self._buf = self._buf[pos:]
+        if self._state == "tail":
+            self._head += self._buf
+            self._buf = ""
+
+    def _parse_bulk(self):
+        # Быстрый путь: все целые объекты буфера разбираются одним вызовом json.loads.
+        # Если граница выбрана неудачно (например, "}" внутри названия), разбираем по одному
+        cut = self._buf.rfind("}") + 1
+        if not cut:
+            return
+        try:
+            games = json.loads("[" + self._buf[:cut].lstrip(" \t\r\n,") + "]")
+        except ValueError:
+            return
+        for game in games:
+            self._add(game)
+        self._buf = self._buf[cut:]
+
+    def _add(self, game):
+        self.parsed += 1
+        playtime = game.get("playtime_forever", 0)
+        self.total_playtime += playtime
+        heap = self._heap
+        # Большинство игр в топ не попадает: отсекаем их до создания записи
+        if len(heap) >= self.top_n and playtime < heap[0][0]:
+            return
+        appid = game.get("appid")
+        item = (playtime, -(appid or 0), GameEntry(appid, game.get("name"), playtime))
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    def result(self):
+        """ Итог разбора или None, если в ответе нет списка игр (профиль закрыт) """
+        self._buf += self._decoder.decode(b"", final=True)
+        self._parse()
+        if self._state != "tail":
+            return None
+        match = _GAME_COUNT.search(self._head)
+        game_count = int(match.group(1)) if match else self.parsed
+        top_games = [entry for _, _, entry in sorted(self._heap, key=lambda item: item[:2], reverse=True)]
+        return OwnedGamesSummary(game_count, self.total_playtime, top_games)
+
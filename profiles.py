@@ -0,0 +1,128 @@
+import database as db
+from cache import TTLCache
+
+# Сколько пользователей держать в памяти и как долго (секунды)
+MAX_ENTRIES = 10000
+TTL = 600
+
+
+class UserProfiles:
+    """ Профили одного пользователя с индексами по имени и по profile_id """
+
+    __slots__ = ("steam_ids", "ids", "names")
+
+    def __init__(self, rows):
+        # rows: [(profile_id, profile_name, steam_id), ...]
+        self.steam_ids = {name: steam_id for _, name, steam_id in rows}  # имя -> Steam ID
+        self.ids = {name: profile_id for profile_id, name, _ in rows}  # имя -> profile_id
+        self.names = {profile_id: name for profile_id, name, _ in rows}  # profile_id -> имя
+
+    def rows(self):
+        return [(self.ids[name], name, steam_id) for name, steam_id in self.steam_ids.items()]
+
+
+class ProfileCache:
+    """ Профили пользователей в памяти: user_id -> UserProfiles.
+
+    Запись сквозная: add() и delete() сначала меняют базу, затем кэш,
+    поэтому клавиатура команды и обработчик кнопки обходятся без запросов
+    к базе. Профиль могли добавить через другую реплику бота, поэтому
+    промах (нет профилей, нет имени или profile_id) перепроверяется по базе
+    один раз, прежде чем ответить «не найден». Записи в кэше не изменяются на месте.
+    """
+
+    def __init__(self, storage, ttl=TTL, max_entries=MAX_ENTRIES):
+        self.storage = storage
+        self._cache = TTLCache(ttl=ttl, max_entries=max_entries)
+        self._changed = None  # Пользователи, чьи профили менялись во время прогрева
+
+    async def get_entry(self, user_id):
+        entry, cached = await self._lookup(user_id)
+        if cached and not entry.steam_ids:
+            entry = await self.reload(user_id)
+        return entry
+
+    async def _lookup(self, user_id):
+        """ (запись, взята ли она из кэша): перечитывать из базы стоит только запись из кэша """
+        cached = user_id in self._cache
+        return await self._cache.get_or_fetch(user_id, lambda: self._load(user_id)), cached
+
+    async def reload(self, user_id):
+        """ Перечитать профили пользователя из базы """
+        self.invalidate(user_id)
+        return await self._cache.get_or_fetch(user_id, lambda: self._load(user_id))
+
+    async def _load(self, user_id):
+        return UserProfiles(await self.storage.run(db.get_user_profile_ids, user_id))
+
+    async def get(self, user_id):
+        """ Профили пользователя: {имя профиля: Steam ID} (не изменять) """
+        return (await self.get_entry(user_id)).steam_ids
+
+    async def steam_id(self, user_id, profile_name):
+        """ Steam ID профиля по имени или None """
+        entry, cached = await self._lookup(user_id)
+        if cached and profile_name not in entry.steam_ids:
+            entry = await self.reload(user_id)
+        return entry.steam_ids.get(profile_name)
+
+    async def profile(self, user_id, profile_id):
+        """ (имя профиля, Steam ID) по profile_id или None, если профиль не найден или чужой """
+        entry, cached = await self._lookup(user_id)
+        if cached and profile_id not in entry.names:
+            entry = await self.reload(user_id)
+        name = entry.names.get(profile_id)
+        return None if name is None else (name, entry.steam_ids[name])
+
+    async def warm_up(self, max_users):
+        """ Загрузить одним запросом профили пользователей с активным отслеживанием:
+        им приходят уведомления, и после перезапуска кнопки нажимают прежде всего они.
+        Возвращает число загруженных пользователей """
+        self._changed = set()
+        try:
+            rows = await self.storage.run(db.get_tracking_users_profiles, max_users)
+            by_user = {}
+            for user_id, profile_id, profile_name, steam_id in rows:
+                by_user.setdefault(user_id, []).append((profile_id, profile_name, steam_id))
+            loaded = 0
+            for user_id, user_rows in by_user.items():
+                # Свежую запись и профили, изменённые во время запроса, не затираем
+                if user_id not in self._cache and user_id not in self._changed:
+                    self._cache.set(user_id, UserProfiles(user_rows))
+                    loaded += 1
+            return loaded
+        finally:
+            self._changed = None
+
+    def _mark_changed(self, user_id):
+        if self._changed is not None:
+            self._changed.add(user_id)
+
+    async def add(self, user_id, profile_name, steam_id):
+        """ Добавить профиль. False, если профиль с таким именем уже есть """
+        profile_id = await self.storage.run(db.add_profile, user_id, profile_name, steam_id)
+        if not profile_id:
+            return False
+        self._mark_changed(user_id)
+        entry = self._cache.get(user_id)
+        if entry is not None:
+            self._cache.set(user_id, UserProfiles(entry.rows() + [(profile_id, profile_name, steam_id)]))
+        return True
+
+    async def delete(self, user_id, profile_name):
+        """ Удалить профиль: (Steam ID, отключено ли отслеживание) или None, если его не было """
+        deleted = await self.storage.run(db.delete_profile, user_id, profile_name)
+        if deleted is None:
+            return None
+        self._mark_changed(user_id)
+        entry = self._cache.get(user_id)
+        if entry is not None:
+            self._cache.set(user_id, UserProfiles([row for row in entry.rows() if row[1] != profile_name]))
+        return deleted
+
+    def invalidate(self, user_id):
+        self._mark_changed(user_id)
+        self._cache.pop(user_id)
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,34 @@
+import time
+
+
+class TokenBucket:
+    """ Ведро токенов: rate токенов в секунду, не больше capacity в запасе """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now=None):
+        """ Сколько секунд ждать до появления токена (0 — можно сейчас) """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now=None):
+        """ Забрать токен. Возвращает время ожидания, если токена нет """
+        wait = self.delay(now)
+        if wait == 0:
+            self.tokens -= 1
+        return wait
+
+    def is_full(self, now=None):
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= self.capacity
@@ -0,0 +1,73 @@
+import random
+import time
+
+CLOSED = "closed"  # Запросы идут как обычно
+OPEN = "open"  # Запросы не отправляются до истечения паузы
+HALF_OPEN = "half_open"  # Пауза истекла: пропускается один пробный запрос
+
+
+def backoff_delay(attempt, base, cap):
+    """ Пауза перед повтором номер attempt (с 0): экспонента со случайным разбросом (full jitter) """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """ Предохранитель для одного метода API.
+
+    После failure_threshold ошибок подряд размыкается на reset_timeout
+    секунд (со случайным разбросом, чтобы процессы не возвращались разом).
+    Затем пропускает один пробный запрос: успех замыкает предохранитель,
+    ошибка снова размыкает его на вдвое большее время, до max_reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, max_reset_timeout=600):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0  # Сколько раз подряд размыкался без успешного запроса
+        self.opened_until = 0
+        self._probe_until = 0
+
+    @property
+    def closed(self):
+        return self.state == CLOSED
+
+    def allow(self, now=None):
+        """ Можно ли отправить запрос сейчас """
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN:
+            if now < self.opened_until:
+                return False
+            self.state = HALF_OPEN
+        # Один пробный запрос; если он завис или отменён, через reset_timeout пропускаем следующий
+        if now < self._probe_until:
+            return False
+        self._probe_until = now + self.reset_timeout
+        return True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._probe_until = 0
+
+    def record_failure(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._probe_until = 0
+        if self.state == HALF_OPEN:
+            self._trip(now)
+            return
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._trip(now)
+
+    def _trip(self, now):
+        self.trips += 1
+        timeout = min(self.max_reset_timeout, self.reset_timeout * 2 ** (self.trips - 1))
+        self.opened_until = now + random.uniform(timeout / 2, timeout)
+        self.state = OPEN
+        self.failures = 0
@@ -0,0 +1,95 @@
+import os
+
+try:
+    import config
+except ImportError:
+    # Без config.py работают значения по умолчанию и переменные окружения
+    config = None
+
+# Необязательные настройки. Любую из них можно переопределить в config.py,
+# добавив переменную с тем же именем.
+
+
+def _get(name, default):
+    return getattr(config, name, default)
+
+
+def require(*names):
+    """ Проверить, что обязательные настройки заданы (вызывается при запуске, а не при импорте) """
+    missing = [name for name in names if not globals().get(name)]
+    if missing:
+        raise RuntimeError(f"Не заданы обязательные настройки {', '.join(missing)}: укажите их в config.py "
+                           "(API_TOKEN и STEAM_API_KEY можно задать и переменными окружения)")
+
+
+# Токен бота и ключ Steam API (обязательны для main.py; worker.py и bulk.py import нужен только ключ)
+API_TOKEN = _get("API_TOKEN", os.environ.get("API_TOKEN"))
+STEAM_API_KEY = _get("STEAM_API_KEY", os.environ.get("STEAM_API_KEY"))
+
+
+# HTTP-клиент Steam
+STEAM_POOL_SIZE = _get("STEAM_POOL_SIZE", 20)  # Максимум одновременных соединений
+STEAM_MAX_CONCURRENCY = _get("STEAM_MAX_CONCURRENCY", 10)  # Максимум одновременных запросов
+STEAM_REQUEST_TIMEOUT = _get("STEAM_REQUEST_TIMEOUT", 10)  # Таймаут запроса (секунды)
+STEAM_KEEPALIVE_TIMEOUT = _get("STEAM_KEEPALIVE_TIMEOUT", 60)  # Время жизни простаивающего соединения
+STEAM_DNS_CACHE_TTL = _get("STEAM_DNS_CACHE_TTL", 300)  # Время кэширования DNS (секунды)
+STEAM_RETRIES = _get("STEAM_RETRIES", 2)  # Повторов при 429, 5xx и таймаутах
+STEAM_BACKOFF_BASE = _get("STEAM_BACKOFF_BASE", 0.5)  # Начальная пауза перед повтором (секунды)
+STEAM_BACKOFF_MAX = _get("STEAM_BACKOFF_MAX", 8)  # Максимальная пауза перед повтором (секунды)
+STEAM_BREAKER_THRESHOLD = _get("STEAM_BREAKER_THRESHOLD", 5)  # Ошибок подряд до размыкания предохранителя
+STEAM_BREAKER_RESET = _get("STEAM_BREAKER_RESET", 30)  # Пауза до пробного запроса (секунды)
+
+# Кэш ответов GetOwnedGames для /steam и /info
+GAMES_CACHE_TTL = _get("GAMES_CACHE_TTL", 300)  # Время жизни записи (секунды)
+GAMES_CACHE_MAX_ENTRIES = _get("GAMES_CACHE_MAX_ENTRIES", 1000)  # Максимум профилей в кэше
+GAMES_CACHE_MAX_BYTES = _get("GAMES_CACHE_MAX_BYTES", 64 * 1024 * 1024)  # Максимальный объём кэша
+
+# Названия и иконки игр (таблица app_metadata)
+APP_METADATA_CACHE_SIZE = _get("APP_METADATA_CACHE_SIZE", 10000)  # Игр в памяти
+APP_METADATA_REFRESH = _get("APP_METADATA_REFRESH", 30 * 24 * 3600)  # Срок обновления сведений (секунды)
+
+# Максимальное количество профилей на пользователя (в том числе при импорте /import)
+MAX_PROFILES_PER_USER = _get("MAX_PROFILES_PER_USER", 5)
+
+# Кэш профилей пользователей
+PROFILE_CACHE_TTL = _get("PROFILE_CACHE_TTL", 600)  # Время жизни записи (секунды)
+PROFILE_CACHE_SIZE = _get("PROFILE_CACHE_SIZE", 10000)  # Максимум пользователей в кэше
+
+# База данных
+DB_PATH = _get("DB_PATH", "steam_bot.db")
+
+# Очередь уведомлений Telegram
+TELEGRAM_GLOBAL_RATE = _get("TELEGRAM_GLOBAL_RATE", 30)  # Сообщений в секунду всего
+TELEGRAM_CHAT_RATE = _get("TELEGRAM_CHAT_RATE", 1)  # Сообщений в секунду в один чат
+NOTIFIER_WORKERS = _get("NOTIFIER_WORKERS", 4)  # Одновременных отправок
+TELEGRAM_API_URL = _get("TELEGRAM_API_URL", None)  # Свой сервер Bot API, например http://localhost:8081
+
+# Опрос активности Steam
+POLL_INTERVAL = _get("POLL_INTERVAL", 30)  # Интервал для играющих и недавно активных (секунды)
+POLL_MAX_INTERVAL = _get("POLL_MAX_INTERVAL", 600)  # Предел интервала для неактивных (секунды)
+STEAM_POLL_REQUESTS_PER_MINUTE = _get("STEAM_POLL_REQUESTS_PER_MINUTE", 50)  # Бюджет запросов опроса
+POLL_DEGRADED_FACTOR = _get("POLL_DEGRADED_FACTOR", 4)  # Растяжение интервалов, пока Steam недоступен
+
+# Метрики и журнал
+METRICS_HOST = _get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _get("METRICS_PORT", None)  # Порт HTTP /metrics; None — не запускать
+LOG_FORMAT = _get("LOG_FORMAT", "text")  # "text" или "json" (структурированный журнал)
+LOG_LEVEL = _get("LOG_LEVEL", "INFO")
+STARTUP_BUDGET = _get("STARTUP_BUDGET", 2)  # Ожидаемое время запуска (секунды); дольше — предупреждение в журнале
+
+# Режим работы: "polling" (getUpdates) или "webhook"
+BOT_MODE = _get("BOT_MODE", "polling")
+WEBHOOK_URL = _get("WEBHOOK_URL", "")  # Внешний адрес, например https://bot.example.com
+WEBHOOK_PATH = _get("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = _get("WEBHOOK_SECRET", None)  # X-Telegram-Bot-Api-Secret-Token (обязателен): 1-256 символов A-Z, a-z, 0-9, _ и -
+WEBAPP_HOST = _get("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = _get("WEBAPP_PORT", 8080)
+
+# Отслеживание в этом процессе. При нескольких репликах включайте только в одной
+TRACKER_ENABLED = _get("TRACKER_ENABLED", True)
+
+# Процессы-трекеры worker.py
+WORKER_HEARTBEAT_INTERVAL = _get("WORKER_HEARTBEAT_INTERVAL", 5)  # Период сигнала «жив» (секунды)
+WORKER_TIMEOUT = _get("WORKER_TIMEOUT", 20)  # Через сколько молчащий процесс считается остановленным
+WORKER_SYNC_INTERVAL = _get("WORKER_SYNC_INTERVAL", 10)  # Период чтения таблицы tracking (секунды)
+OUTBOX_POLL_INTERVAL = _get("OUTBOX_POLL_INTERVAL", 0.5)  # Период записи и чтения outbox (секунды)
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+import metrics
+import settings
+from owned_games import TOP_GAMES, OwnedGamesParser
+from resilience import CircuitBreaker, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+STEAM_API_URL = "https://api.steampowered.com"
+
+# Размер куска при потоковом чтении ответа
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryableError(Exception):
+    """ Временная ошибка Steam: перегрузка, сбой сервера, таймаут или обрыв соединения """
+
+    def __init__(self, reason, retry_after=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class SteamClient:
+    """ Общий HTTP-клиент Steam Web API.
+
+    Одна сессия с пулом keep-alive соединений и кэшем DNS на весь процесс.
+    Сессия создаётся в start() при запуске диспетчера и закрывается в close().
+
+    Временные ошибки (429, 5xx, таймауты) повторяются с экспоненциальной
+    паузой, а у каждого метода API свой предохранитель: после серии
+    ошибок запросы к методу не отправляются, пока Steam не восстановится.
+    """
+
+    def __init__(self, api_key, pool_size=20, max_concurrency=10, timeout=10,
+                 keepalive_timeout=60, dns_cache_ttl=300, retries=2, backoff_base=0.5,
+                 backoff_max=8, breaker_threshold=5, breaker_reset=30):
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        # Путь метода API -> CircuitBreaker
+        self.breakers = {}
+        self._session = None
+        self._semaphore = None
+
+    @classmethod
+    def from_settings(cls, api_key=None):
+        """ Клиент с пулом, таймаутами, повторами и предохранителями из settings """
+        return cls(
+            api_key if api_key is not None else settings.STEAM_API_KEY,
+            pool_size=settings.STEAM_POOL_SIZE,
+            max_concurrency=settings.STEAM_MAX_CONCURRENCY,
+            timeout=settings.STEAM_REQUEST_TIMEOUT,
+            keepalive_timeout=settings.STEAM_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl=settings.STEAM_DNS_CACHE_TTL,
+            retries=settings.STEAM_RETRIES,
+            backoff_base=settings.STEAM_BACKOFF_BASE,
+            backoff_max=settings.STEAM_BACKOFF_MAX,
+            breaker_threshold=settings.STEAM_BREAKER_THRESHOLD,
+            breaker_reset=settings.STEAM_BREAKER_RESET,
+        )
+
+    async def start(self):
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def breaker(self, path):
+        breaker = self.breakers.get(path)
+        if breaker is None:
+            breaker = self.breakers[path] = CircuitBreaker(
+                failure_threshold=self.breaker_threshold,
+                reset_timeout=self.breaker_reset,
+            )
+            metrics.STEAM_CIRCUIT_OPEN.set_function(lambda: int(not breaker.closed), endpoint=path)
+        return breaker
+
+    def is_degraded(self):
+        """ Разомкнут ли предохранитель хотя бы одного метода (Steam сейчас недоступен) """
+        return any(not breaker.closed for breaker in self.breakers.values())
+
+    async def request(self, path, read, retries=None, **params):
+        """ GET-запрос к Steam API; тело ответа обрабатывает корутина read(response).
+        retries — число повторов вместо заданного в клиенте.
+        None при ошибке, таймауте, статусе не 200 или разомкнутом предохранителе """
+        if self._session is None:
+            await self.start()
+        retries = self.retries if retries is None else retries
+        params["key"] = self.api_key
+        breaker = self.breaker(path)
+        for attempt in range(retries + 1):
+            if not breaker.allow():
+                metrics.STEAM_REQUEST_ERRORS.inc(endpoint=path, reason="circuit_open")
+                return None
+            try:
+                result = await self._attempt(path, read, params)
+            except RetryableError as e:
+                breaker.record_failure()
+                metrics.STEAM_REQUEST_ERRORS.inc(endpoint=path, reason=e.reason)
+                delay = e.retry_after if e.retry_after is not None else backoff_delay(
+                    attempt, self.backoff_base, self.backoff_max)
+                if attempt == retries or delay > self.backoff_max:
+                    logger.warning("Запрос %s к Steam API не выполнен: %s", path, e.reason)
+                    return None
+                # Ждём вне семафора, чтобы не занимать место других запросов
+                await asyncio.sleep(delay)
+                continue
+            # Steam ответил (пусть и ошибкой вроде 403): метод работает
+            breaker.record_success()
+            return result
+
+    async def _attempt(self, path, read, params):
+        """ Один запрос. Временные ошибки — RetryableError, остальные — None """
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                async with self._session.get(STEAM_API_URL + path, params=params) as response:
+                    if response.status in RETRY_STATUSES:
+                        retry_after = response.headers.get("Retry-After")
+                        raise RetryableError(
+                            str(response.status),
+                            float(retry_after) if retry_after and retry_after.isdigit() else None,
+                        )
+                    if response.status != 200:
+                        metrics.STEAM_REQUEST_ERRORS.inc(endpoint=path, reason=str(response.status))
+                        return None
+                    return await read(response)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise RetryableError(type(e).__name__) from e
+            except ValueError as e:
+                metrics.STEAM_REQUEST_ERRORS.inc(endpoint=path, reason=type(e).__name__)
+                logger.warning("Некорректный ответ Steam API на %s: %r", path, e)
+                return None
+            finally:
+                metrics.STEAM_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=path)
+
+    async def get_json(self, path, retries=None, **params):
+        """ GET-запрос с разбором JSON целиком """
+        return await self.request(path, lambda response: response.json(content_type=None), retries, **params)
+
+    async def get_player_summaries(self, steam_ids, retries=None):
+        """ Список игроков из GetPlayerSummaries (не более 100 Steam ID) """
+        data = await self.get_json(
+            "/ISteamUser/GetPlayerSummaries/v2/",
+            retries,
+            steamids=",".join(steam_ids),
+            format="json",
+        )
+        if data and "response" in data and "players" in data["response"]:
+            return data["response"]["players"]
+        return None
+
+    async def get_statuses(self, steam_ids, retries=None):
+        """ Статусы профилей {steam_id: игрок} или None при ошибке """
+        players = await self.get_player_summaries(steam_ids, retries)
+        if players is None:
+            return None
+        return {player["steamid"]: player for player in players}
+
+    async def poll_statuses(self, steam_ids):
+        """ get_statuses для ActivityTracker: без повторов. Повтором служит следующий такт,
+        который учитывается в бюджете запросов опроса и не задерживает остальные пачки """
+        return await self.get_statuses(steam_ids, retries=0)
+
+    async def get_owned_games_summary(self, steam_id, top_n=TOP_GAMES):
+        """ Итог по библиотеке (OwnedGamesSummary) без загрузки всего ответа в память.
+        Названия игр не запрашиваются (name = None): их даёт AppMetadataCache """
+        async def read(response):
+            parser = OwnedGamesParser(top_n)
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                parser.feed(chunk)
+            return parser.result()
+
+        return await self.request(
+            "/IPlayerService/GetOwnedGames/v0001/",
+            read,
+            steamid=steam_id,
+            format="json",
+        )
+
+    async def get_app_info(self, steam_id, appids):
+        """ Названия и иконки игр из библиотеки профиля: {appid: (name, icon)} или None.
+        appids_filter ограничивает ответ только нужными играми """
+        params = {f"appids_filter[{i}]": appid for i, appid in enumerate(appids)}
+        data = await self.get_json(
+            "/IPlayerService/GetOwnedGames/v0001/",
+            steamid=steam_id,
+            include_appinfo="true",
+            include_played_free_games="true",
+            format="json",
+            **params,
+        )
+        if not data or "games" not in data.get("response", {}):
+            return None
+        return {game["appid"]: (game.get("name"), game.get("img_icon_url")) for game in data["response"]["games"]}
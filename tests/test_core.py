@@ -0,0 +1,197 @@
+""" Тесты чистой логики: разбор GetOwnedGames, события активности, callback_data и дневные итоги.
+
+Запуск из корня репозитория:
+    python -m pytest -q tests
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import activity  # noqa: E402
+import callbacks  # noqa: E402
+import database as db  # noqa: E402
+from owned_games import OwnedGamesParser  # noqa: E402
+
+
+# --- OwnedGamesParser ---
+
+NAMES = ["Dota 2", "Half-Life}", "{Portal}", 'Say "hi"}, {', "Ведьмак 3 }]", "日本語}", "a]}b", ""]
+
+
+def make_games(rnd, count):
+    games = []
+    for i in range(count):
+        game = {"appid": rnd.randrange(1, 2_000_000), "playtime_forever": rnd.choice([0, 5, 60, rnd.randrange(10_000)])}
+        if rnd.random() < 0.7:
+            game["name"] = rnd.choice(NAMES) + str(i)
+        games.append(game)
+    return games
+
+
+def expected_summary(body, top_n):
+    games = json.loads(body)["response"]["games"]
+    top = sorted(games, key=lambda g: (-g.get("playtime_forever", 0), g["appid"]))[:top_n]
+    return (
+        len(games),
+        sum(g.get("playtime_forever", 0) for g in games),
+        [(g["appid"], g.get("name"), g.get("playtime_forever", 0)) for g in top],
+    )
+
+
+def feed_in_chunks(body, rnd, top_n):
+    raw = body.encode()
+    parser = OwnedGamesParser(top_n=top_n)
+    pos = 0
+    while pos < len(raw):
+        # Куски режут и многобайтные символы UTF-8, и объекты посередине
+        size = rnd.choice([1, 2, 3, 7, 64, 1000])
+        parser.feed(raw[pos:pos + size])
+        pos += size
+    return parser.result()
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_owned_games_random_chunks(seed):
+    rnd = random.Random(seed)
+    games = make_games(rnd, rnd.randrange(0, 300))
+    body = json.dumps({"response": {"game_count": len(games), "games": games}}, ensure_ascii=rnd.random() < 0.5)
+    top_n = rnd.choice([1, 5, 10])
+
+    summary = feed_in_chunks(body, rnd, top_n)
+
+    game_count, total, top = expected_summary(body, top_n)
+    assert summary.game_count == game_count
+    assert summary.total_playtime == total
+    assert [tuple(game) for game in summary.top_games] == top
+
+
+def test_owned_games_brace_inside_name():
+    # "}" внутри названия сбивает быстрый путь json.loads: должен сработать разбор по одному
+    games = [{"appid": 1, "name": "a}", "playtime_forever": 10},
+             {"appid": 2, "name": "}{", "playtime_forever": 30},
+             {"appid": 3, "name": "b", "playtime_forever": 20}]
+    body = json.dumps({"response": {"game_count": 3, "games": games}})
+    for cut in range(1, len(body)):
+        parser = OwnedGamesParser(top_n=2)
+        parser.feed(body[:cut].encode())
+        parser.feed(body[cut:].encode())
+        summary = parser.result()
+        assert summary.game_count == 3
+        assert summary.total_playtime == 60
+        assert [game.appid for game in summary.top_games] == [2, 3]
+
+
+def test_owned_games_private_profile():
+    parser = OwnedGamesParser()
+    parser.feed(b'{"response": {}}')
+    assert parser.result() is None
+
+
+# --- activity.diff_states ---
+
+def state(personastate=1, gameid=None, game=None):
+    return activity.PlayerState(personastate, gameid, game, None)
+
+
+@pytest.mark.parametrize("old, new, expected", [
+    (None, state(game="Dota 2", gameid="570"), [(activity.STARTED, "Dota 2", None)]),
+    (state(), state(game="Dota 2", gameid="570"), [(activity.STARTED, "Dota 2", None)]),
+    (state(game="Dota 2", gameid="570"), state(game="Portal", gameid="400"),
+     [(activity.SWITCHED, "Portal", "Dota 2")]),
+    (state(game="Dota 2", gameid="570"), state(), [(activity.STOPPED, None, "Dota 2")]),
+    (state(game="Dota 2", gameid="570"), state(personastate=0), [(activity.WENT_OFFLINE, None, "Dota 2")]),
+    (state(), state(personastate=0), [(activity.WENT_OFFLINE, None, None)]),
+    (state(game="Dota 2", gameid="570"), state(personastate=3, game="Dota 2", gameid="570"), []),
+    (None, state(personastate=0), []),
+])
+def test_diff_states(old, new, expected):
+    events = activity.diff_states("7", old, new)
+    assert [(event.kind, event.game, event.previous_game) for event in events] == expected
+    assert all(event.steam_id == "7" for event in events)
+
+
+def test_restored_state_same_game_is_silent():
+    # После перезапуска известна только игра: та же игра не должна дать повторное уведомление
+    store = activity.StateStore()
+    store.restore("7", "Dota 2")
+    assert store.update("7", {"personastate": 1, "gameid": "570", "gameextrainfo": "Dota 2"}) == []
+    events = store.update("7", {"personastate": 1})
+    assert [event.kind for event in events] == [activity.STOPPED]
+
+
+# --- callbacks ---
+
+@pytest.mark.parametrize("action", sorted(callbacks.ACTIONS))
+@pytest.mark.parametrize("profile_id", [None, 0, 1, 255, 256, 65536, 2 ** 40, 2 ** 63 - 1])
+def test_callbacks_round_trip(action, profile_id):
+    data = callbacks.encode(action, profile_id)
+    assert len(data.encode()) <= 12
+    assert callbacks.decode(data) == (action, profile_id)
+
+
+@pytest.mark.parametrize("data", ["", "X", "steam:profile", "T" + "A" * 20])
+def test_callbacks_decode_rejects_foreign_data(data):
+    with pytest.raises(ValueError):
+        callbacks.decode(data)
+
+
+# --- split_by_day / get_playtime ---
+
+DAY = date(2024, 3, 10)
+
+
+def at(day, hour, minute=0):
+    """ unix time местного времени """
+    return int(datetime(day.year, day.month, day.day, hour, minute).timestamp())
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db.create_tables(conn)
+    db.migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_split_by_day_across_midnight():
+    next_day = DAY + timedelta(days=1)
+    assert list(db.split_by_day(at(DAY, 23), at(next_day, 1, 30))) == [
+        (DAY.isoformat(), 3600),
+        (next_day.isoformat(), 5400),
+    ]
+    assert list(db.split_by_day(at(DAY, 10), at(DAY, 10))) == []
+
+
+def test_playtime_closed_session_across_midnight(conn):
+    next_day = DAY + timedelta(days=1)
+    db.save_activity(conn, [("7", "Dota 2")], now=at(DAY, 23))
+    db.save_activity(conn, [("7", None)], now=at(next_day, 1, 30))
+
+    assert db.get_playtime(conn, "7", next_day, now=at(next_day, 12)) == [("Dota 2", 5400)]
+    assert db.get_playtime(conn, "7", DAY, now=at(next_day, 12)) == [("Dota 2", 9000)]
+
+
+def test_playtime_open_session_across_midnight(conn):
+    next_day = DAY + timedelta(days=1)
+    db.save_activity(conn, [("7", "Dota 2")], now=at(DAY, 23))
+
+    # Открытая сессия считается только с начала запрошенного дня
+    assert db.get_playtime(conn, "7", next_day, now=at(next_day, 1, 30)) == [("Dota 2", 5400)]
+    assert db.get_playtime(conn, "7", DAY, now=at(next_day, 1, 30)) == [("Dota 2", 9000)]
+
+
+def test_playtime_skips_bot_downtime(conn):
+    # Сессия закрывается по last_seen, если бот был остановлен, пока профиль играл
+    db.save_activity(conn, [("7", "Dota 2")], now=at(DAY, 10))
+    db.save_activity(conn, [], now=at(DAY, 10, 10), seen=["7"])
+    db.save_activity(conn, [("7", None)], now=at(DAY, 13), resumed=["7"])
+
+    assert db.get_playtime(conn, "7", DAY, now=at(DAY, 14)) == [("Dota 2", 600)]
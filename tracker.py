@@ -0,0 +1,333 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+
+import metrics
+from activity import OFFLINE, STARTED, STOPPED, SWITCHED, WENT_OFFLINE, StateStore, changes_game
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# GetPlayerSummaries принимает не более 100 Steam ID за один запрос
+STEAM_BATCH_SIZE = 100
+
+# Интервал опроса играющих и недавно активных профилей (секунды)
+POLL_INTERVAL = 30
+
+# Предел, до которого растёт интервал для неактивных профилей (секунды)
+MAX_POLL_INTERVAL = 600
+
+# Сколько после выхода из сети профиль считается недавно активным (секунды)
+RECENT_ACTIVITY_WINDOW = 3600
+
+# Бюджет запросов GetPlayerSummaries в минуту (лимит ключа Steam — 100 000 запросов в сутки)
+REQUESTS_PER_MINUTE = 50
+
+# Как часто планировщик проверяет, кого пора опросить (секунды)
+TICK = 1
+
+# Во сколько раз растягиваются интервалы, пока Steam недоступен
+DEGRADED_FACTOR = 4
+
+# Тексты уведомлений по типу события
+MESSAGES = {
+    STARTED: "🎮 Пользователь {name} начал играть в {game}.",
+    SWITCHED: "🎮 Пользователь {name} переключился с {previous_game} на {game}.",
+    STOPPED: "🛑 Пользователь {name} больше не играет.",
+    WENT_OFFLINE: "🛑 Пользователь {name} больше не играет и вышел из сети.",
+}
+
+
+def chunked(items, size):
+    """ Разбить список на части не длиннее size """
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class ActivityTracker:
+    """ Центральный планировщик опроса активности Steam.
+
+    Отслеживаемые Steam ID опрашиваются пачками по STEAM_BATCH_SIZE,
+    а результат рассылается во все чаты, которые следят за профилем.
+    У каждого профиля свой срок следующего опроса: играющие и недавно
+    активные опрашиваются раз в interval, для неактивных интервал
+    удваивается до max_interval. Число запросов ограничено бюджетом
+    requests_per_minute; при нехватке первыми опрашиваются активные.
+    Пока degraded() истинно (Steam недоступен), все интервалы растягиваются
+    в degraded_factor раз.
+
+    Сроки лежат в двух min-кучах (активные и неактивные), поэтому такт
+    извлекает только наступившие сроки, а не просматривает все профили.
+    """
+
+    def __init__(self, fetch_statuses, notify, persist=None, interval=POLL_INTERVAL,
+                 max_interval=MAX_POLL_INTERVAL, requests_per_minute=REQUESTS_PER_MINUTE,
+                 batch_size=STEAM_BATCH_SIZE, tick=TICK, degraded=None, degraded_factor=DEGRADED_FACTOR):
+        # fetch_statuses(steam_ids) -> {steam_id: player}, notify(chat_id, text),
+        # persist([(steam_id, last_game), ...], seen, resumed) одной транзакцией сохраняет
+        # все смены игр пачки до отправки уведомлений (см. database.save_activity), degraded() -> bool
+        self.fetch_statuses = fetch_statuses
+        self.notify = notify
+        self.persist = persist
+        self.interval = interval
+        self.max_interval = max_interval
+        self.degraded = degraded
+        self.degraded_factor = degraded_factor
+        self.batch_size = batch_size
+        self.tick = tick
+        self.set_budget(requests_per_minute)
+        # steam_id -> {chat_id: profile_name}
+        self.watchers = {}
+        # Последнее известное состояние каждого профиля
+        self.states = StateStore()
+        # steam_id -> время следующего опроса (time.monotonic)
+        self.due = {}
+        # Кучи (время, steam_id): активные и неактивные профили. При переносе срока старая
+        # запись остаётся в куче и пропускается при извлечении, если не совпадает с due
+        self._queues = ([], [])
+        # steam_id -> сколько опросов подряд профиль был неактивен
+        self.idle_polls = {}
+        # Восстановленные с игрой и ещё не опрошенные после перезапуска
+        self.resumed = set()
+        self._task = None
+
+    def set_budget(self, requests_per_minute):
+        """ Задать бюджет запросов (например, долю общего бюджета для процесса-трекера) """
+        self.requests_per_minute = requests_per_minute
+        # Запас — не больше чем на 10 секунд, чтобы не было всплесков запросов
+        rate = requests_per_minute / 60
+        self.budget = TokenBucket(rate, capacity=max(1, rate * 10))
+
+    def watch(self, steam_id, chat_id, profile_name):
+        """ Подписать чат на профиль. False, если подписка уже есть """
+        chats = self.watchers.setdefault(steam_id, {})
+        if chat_id in chats:
+            return False
+        chats[chat_id] = profile_name
+        # Новый профиль опрашивается на ближайшем такте
+        if steam_id not in self.due:
+            self._schedule(steam_id, time.monotonic())
+        return True
+
+    def unwatch(self, steam_id, chat_id):
+        """ Отписать чат от профиля. False, если подписки не было """
+        chats = self.watchers.get(steam_id)
+        if not chats or chat_id not in chats:
+            return False
+        del chats[chat_id]
+        if not chats:
+            del self.watchers[steam_id]
+            self.states.forget(steam_id)
+            self.due.pop(steam_id, None)
+            self.idle_polls.pop(steam_id, None)
+            self.resumed.discard(steam_id)
+        return True
+
+    def restore(self, steam_id, chat_id, profile_name, last_game=None):
+        """ Восстановить подписку после перезапуска вместе с последней игрой """
+        if last_game and self.states.get(steam_id) is None:
+            self.states.restore(steam_id, last_game)
+            self.resumed.add(steam_id)
+        if self.watch(steam_id, chat_id, profile_name) and len(self.watchers[steam_id]) == 1:
+            # Игравшие до перезапуска опрашиваются сразу, чтобы не пропустить смену игры;
+            # остальным — случайный сдвиг, чтобы профили не опрашивались разом
+            self._schedule(steam_id, time.monotonic() + (0 if last_game else random.uniform(0, self.interval)))
+
+    def is_watching(self, steam_id, chat_id):
+        return chat_id in self.watchers.get(steam_id, {})
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception:
+                logger.exception("Ошибка в цикле опроса Steam")
+            await asyncio.sleep(self.tick)
+
+    def _schedule(self, steam_id, at):
+        """ Назначить срок опроса; очередь (активные или нет) выбирается по текущему состоянию """
+        self.due[steam_id] = at
+        active = self._is_active(self.states.get(steam_id))
+        heapq.heappush(self._queues[0 if active else 1], (at, steam_id))
+        if len(self._queues[0]) + len(self._queues[1]) > 2 * len(self.due) + 1024:
+            self._compact()
+
+    def _compact(self):
+        """ Пересобрать кучи без устаревших записей (их накапливается не больше, чем действительных) """
+        queues = ([], [])
+        for steam_id, at in self.due.items():
+            queues[0 if self._is_active(self.states.get(steam_id)) else 1].append((at, steam_id))
+        for queue in queues:
+            heapq.heapify(queue)
+        self._queues = queues
+
+    def _peek(self, queue):
+        """ Ближайшая действительная запись кучи; устаревшие выбрасываются """
+        while queue:
+            at, steam_id = queue[0]
+            if self.due.get(steam_id) == at:
+                return queue[0]
+            heapq.heappop(queue)
+        return None
+
+    def _take_due(self, now, limit, taken):
+        """ Извлечь до limit профилей со сроком не позже now: сначала активные, затем те,
+        кто дольше ждёт опроса. taken — уже выбранные в этом такте steam_id """
+        batch = []
+        for queue in self._queues:
+            while len(batch) < limit:
+                entry = self._peek(queue)
+                if entry is None or entry[0] > now:
+                    break
+                heapq.heappop(queue)
+                if entry[1] not in taken:
+                    taken.add(entry[1])
+                    batch.append(entry)
+        return batch
+
+    def _take_soon(self, until, limit, taken):
+        """ Извлечь до limit профилей с ближайшими сроками не позже until (из обеих куч) """
+        soon = []
+        while len(soon) < limit:
+            heads = [(entry, queue) for queue in self._queues for entry in [self._peek(queue)]
+                     if entry is not None and entry[0] <= until]
+            if not heads:
+                break
+            entry, queue = min(heads, key=lambda head: head[0])
+            heapq.heappop(queue)
+            if entry[1] not in taken:
+                taken.add(entry[1])
+                soon.append(entry)
+        return soon
+
+    def _is_active(self, state):
+        if state is None or state.personastate is None:
+            return state is not None and bool(state.game)
+        if state.game or state.personastate != OFFLINE:
+            return True
+        return bool(state.lastlogoff) and time.time() - state.lastlogoff < RECENT_ACTIVITY_WINDOW
+
+    def _stretch(self):
+        """ Множитель интервалов: больше 1, пока Steam недоступен """
+        if self.degraded is not None and self.degraded():
+            return self.degraded_factor
+        return 1
+
+    async def poll_once(self, now=None):
+        """ Один такт: опросить профили, срок опроса которых наступил.
+
+        Возвращает число отправленных запросов.
+        """
+        now = time.monotonic() if now is None else now
+        taken = set()
+        due = []
+        # Пачка за пачкой, пока есть наступившие сроки и бюджет: работа такта
+        # пропорциональна числу запросов, а не числу отслеживаемых профилей
+        while True:
+            batch = self._take_due(now, self.batch_size, taken)
+            if not batch:
+                break
+            if self.budget.take(now) != 0:
+                # Бюджет исчерпан: профили ждут следующего такта
+                for at, steam_id in batch:
+                    self._schedule(steam_id, at)
+                break
+            due.extend(batch)
+            if len(batch) < self.batch_size:
+                break
+        if not due:
+            return 0
+        stretch = self._stretch()
+        interval = self.interval * stretch
+        metrics.POLL_LAG_SECONDS.observe(now - min(at for at, _ in due))
+        room = -len(due) % self.batch_size
+        if room:
+            # Неполную пачку добиваем профилями, чей срок подходит: запрос тот же
+            due.extend(self._take_soon(now + interval, room, taken))
+        due = [steam_id for _, steam_id in due]
+        # Пока запрос в пути, профиль не должен попасть в следующий такт.
+        # Если запрос не удастся, профиль так и будет опрошен через interval
+        for steam_id in due:
+            self._schedule(steam_id, now + interval)
+        batches = list(chunked(due, self.batch_size))
+        with metrics.POLL_CYCLE_SECONDS.time():
+            await asyncio.gather(*(self._poll_batch(batch, now, stretch) for batch in batches))
+        return len(batches)
+
+    def _reschedule(self, steam_id, changed, now, stretch=1):
+        if changed or self._is_active(self.states.get(steam_id)):
+            self.idle_polls.pop(steam_id, None)
+            delay = self.interval
+        else:
+            idle = self.idle_polls.get(steam_id, 0) + 1
+            self.idle_polls[steam_id] = idle
+            delay = min(self.max_interval, self.interval * 2 ** idle)
+        self._schedule(steam_id, now + delay * stretch)
+
+    async def _poll_batch(self, batch, now, stretch=1):
+        try:
+            players = await self.fetch_statuses(batch)
+        except Exception as e:
+            logger.warning("Не удалось получить статусы для %d профилей: %r", len(batch), e)
+            return
+        if not players:
+            return
+        events, seen, resumed = [], [], []
+        for steam_id in batch:
+            if steam_id not in self.watchers:
+                continue
+            status = players.get(steam_id)
+            changed = self.states.update(steam_id, status) if status else []
+            if status:
+                if steam_id in self.resumed:
+                    self.resumed.discard(steam_id)
+                    resumed.append(steam_id)
+                state = self.states.get(steam_id)
+                if state is not None and state.game and not any(changes_game(event) for event in changed):
+                    seen.append(steam_id)
+            events.extend(changed)
+            self._reschedule(steam_id, bool(changed), now, stretch)
+        changes = [(event.steam_id, event.game) for event in events if changes_game(event)]
+        # Без изменений пишется только отметка «ещё играет» для открытых сессий
+        if changes or seen:
+            await self._persist(changes, seen, resumed)
+        if not events:
+            return
+        for event in events:
+            await self._fan_out(event)
+
+    async def _persist(self, changes, seen=(), resumed=()):
+        if self.persist is None:
+            return
+        try:
+            await self.persist(changes, seen, resumed)
+        except Exception:
+            logger.exception("Не удалось сохранить состояние %d профилей", len(changes))
+
+    async def _fan_out(self, event):
+        # Выход из сети без игры не меняет последнюю игру и не требует уведомления
+        if not changes_game(event):
+            return
+        template = MESSAGES[event.kind]
+        # Копия: подписчики могут измениться, пока идёт отправка
+        for chat_id, profile_name in list(self.watchers.get(event.steam_id, {}).items()):
+            try:
+                await self.notify(chat_id, template.format(
+                    name=profile_name, game=event.game, previous_game=event.previous_game))
+            except Exception:
+                logger.exception("Не удалось отправить уведомление в чат %s", chat_id)
@@ -0,0 +1,164 @@
+""" Отдельный процесс-трекер.
+
+Каждый процесс опрашивает свою часть профилей из таблицы tracking и пишет
+уведомления в outbox, откуда их отправляет процесс бота (TRACKER_ENABLED = False).
+Профили делятся между живыми процессами rendezvous-хешированием, поэтому
+при запуске или остановке процесса переезжает лишь часть профилей.
+
+Запуск (можно несколько раз, по процессу на ядро):
+    python worker.py [--id worker-1]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+import zlib
+
+import database as db
+import logs
+import metrics
+import settings
+from outbox import Outbox
+from steam_api import SteamClient
+from tracker import ActivityTracker
+
+logger = logging.getLogger("worker")
+
+
+def shard_owner(steam_id, workers):
+    """ Процесс, которому принадлежит профиль (rendezvous-хеширование) """
+    return max(workers, key=lambda worker_id: zlib.crc32(f"{worker_id}:{steam_id}".encode()))
+
+
+class TrackerWorker:
+    """ Членство в группе трекеров и синхронизация своей доли отслеживаний """
+
+    def __init__(self, worker_id, storage, tracker, heartbeat_interval=5, worker_timeout=20, sync_interval=10):
+        self.worker_id = worker_id
+        self.storage = storage
+        self.tracker = tracker
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_timeout = worker_timeout
+        self.sync_interval = sync_interval
+        self.total_budget = tracker.requests_per_minute
+        self.workers = [worker_id]
+        self._synced_at = 0
+        # До этого момента новые профили не опрашиваются: прежний владелец ещё не увидел
+        # новый состав и может опрашивать их сам (иначе — двойные уведомления)
+        self._handoff_until = 0
+        self._deferred = False
+
+    async def heartbeat(self):
+        """ Отметиться и обновить список процессов. True, если состав изменился """
+        now = time.time()
+        await self.storage.run(db.register_worker, self.worker_id, now)
+        workers = await self.storage.run(db.get_live_workers, now - self.worker_timeout)
+        if self.worker_id not in workers:
+            workers = sorted(workers + [self.worker_id])
+        if workers == self.workers:
+            return False
+        logger.info("Состав трекеров изменился: %s", ", ".join(workers))
+        self.workers = workers
+        # Остальные увидят новый состав не позже чем через интервал сигнала
+        self._handoff_until = time.monotonic() + self.heartbeat_interval
+        # Бюджет запросов к Steam делится поровну между процессами
+        self.tracker.set_budget(self.total_budget / len(workers))
+        return True
+
+    async def sync(self):
+        """ Привести подписки трекера к своей доле активных записей tracking """
+        rows = await self.storage.run(db.get_active_tracking)
+        wanted = {}
+        for user_id, steam_id, profile_name, last_game in rows:
+            if shard_owner(steam_id, self.workers) == self.worker_id:
+                wanted[(steam_id, user_id)] = (profile_name, last_game)
+        # Отданные профили перестаём опрашивать сразу
+        for steam_id, chats in list(self.tracker.watchers.items()):
+            for chat_id in list(chats):
+                if (steam_id, chat_id) not in wanted:
+                    self.tracker.unwatch(steam_id, chat_id)
+        # Полученные — только после паузы на передачу
+        self._deferred = time.monotonic() < self._handoff_until
+        if not self._deferred:
+            for (steam_id, chat_id), (profile_name, last_game) in wanted.items():
+                if not self.tracker.is_watching(steam_id, chat_id):
+                    self.tracker.restore(steam_id, chat_id, profile_name, last_game)
+        self._synced_at = time.monotonic()
+        logger.debug("Отслеживается %d профилей", len(self.tracker.watchers))
+
+    async def run(self):
+        while True:
+            try:
+                changed = await self.heartbeat()
+                if changed or self._deferred or time.monotonic() - self._synced_at >= self.sync_interval:
+                    await self.sync()
+            except Exception:
+                logger.exception("Ошибка синхронизации трекера")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def leave(self):
+        """ Выйти из группы, чтобы остальные сразу забрали профили """
+        await self.storage.run(db.remove_worker, self.worker_id)
+
+
+async def main(worker_id, metrics_port=None):
+    settings.require("STEAM_API_KEY")
+    storage = db.Database(settings.DB_PATH)
+    steam = SteamClient.from_settings()
+    outbox = Outbox(storage, flush_interval=settings.OUTBOX_POLL_INTERVAL)
+
+    async def save_last_games(changes, seen=(), resumed=()):
+        await storage.run(db.save_activity, changes, None, seen, resumed)
+
+    tracker = ActivityTracker(
+        steam.poll_statuses,
+        outbox.notify,
+        persist=save_last_games,
+        interval=settings.POLL_INTERVAL,
+        max_interval=settings.POLL_MAX_INTERVAL,
+        requests_per_minute=settings.STEAM_POLL_REQUESTS_PER_MINUTE,
+        degraded=steam.is_degraded,
+        degraded_factor=settings.POLL_DEGRADED_FACTOR,
+    )
+    worker = TrackerWorker(
+        worker_id, storage, tracker,
+        heartbeat_interval=settings.WORKER_HEARTBEAT_INTERVAL,
+        worker_timeout=settings.WORKER_TIMEOUT,
+        sync_interval=settings.WORKER_SYNC_INTERVAL,
+    )
+
+    metrics.watch_tracker(tracker)
+
+    # SIGTERM завершает процесс так же аккуратно, как Ctrl+C
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    metrics_server = await metrics.start_server(settings.METRICS_HOST, metrics_port) if metrics_port else None
+    await storage.open()
+    await steam.start()
+    outbox.start()
+    tracker.start()
+    logger.info("Трекер %s запущен", worker_id)
+    try:
+        await worker.run()
+    finally:
+        await tracker.stop()
+        await outbox.stop()
+        await worker.leave()
+        await steam.close()
+        await storage.close()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Процесс-трекер активности Steam")
+    parser.add_argument("--id", default=f"{socket.gethostname()}-{os.getpid()}", help="идентификатор процесса")
+    parser.add_argument("--metrics-port", type=int, default=None, help="порт HTTP /metrics этого процесса")
+    args = parser.parse_args()
+    logs.setup_logging(settings.LOG_FORMAT, settings.LOG_LEVEL)
+    try:
+        asyncio.run(main(args.id, args.metrics_port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass